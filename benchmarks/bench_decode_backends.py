@@ -0,0 +1,72 @@
+import os
+import glob
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from src.video_decoder import DECODERS
+from src.video_metadata import VideoMetadataIndex
+
+def create_parser():
+    """
+    Creates an argparse instance for the decode backend benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Compare wall time and frame differences of the video decode backends.')
+    parser.add_argument('--video_path', type=str, required=True,
+                        help='An mp4 file or a folder searched recursively for mp4 files.')
+    parser.add_argument('--num_videos', type=int, default=10,
+                        help='Maximum number of videos to decode.')
+    parser.add_argument('--backends', type=str, nargs='+', choices=list(DECODERS), default=list(DECODERS),
+                        help='Backends to compare, the first one is the reference for pixel differences.')
+    parser.add_argument('--start', type=int, default=1,
+                        help='Start of the decoded window (in seconds).')
+    parser.add_argument('--end', type=int, default=-1,
+                        help='End of the decoded window (in seconds), -1 for the end of the video.')
+    parser.add_argument('--y_top', type=int, default=0,
+                        help='Top of the signer crop (in pixels).')
+    parser.add_argument('--resize', type=int, default=256,
+                        help='Dimension to which frames are resized (in pixels).')
+    return parser
+
+def main():
+    args = create_parser().parse_args()
+    video_paths = [args.video_path] if os.path.isfile(args.video_path) else sorted(path for path in glob.glob(f'{args.video_path}/**/*.mp4', recursive=True) if os.path.isfile(path)) # Not the AIHub '1.mp4' folder
+    video_paths = video_paths[:args.num_videos]
+
+    decoders = {}
+    for backend in args.backends:
+        try:
+            decoders[backend] = DECODERS[backend]()
+        except ImportError as error:
+            print(f'Skipping {backend}: {error}')
+
+    reference = next(iter(decoders))
+    wall_times: Dict[str, List[float]] = {backend: [] for backend in decoders}
+    pixel_diffs: Dict[str, List[float]] = {backend: [] for backend in decoders}
+    frame_count_mismatches = {backend: 0 for backend in decoders}
+    for video_path in video_paths:
+        video_metadata = VideoMetadataIndex.probe(video_path)
+        reference_frames = None
+        for backend, decoder in decoders.items():
+            start = time.perf_counter()
+            frames = list(decoder.iter_frames(video_path, args.start, args.end, args.y_top, args.resize, video_metadata))
+            wall_times[backend].append(time.perf_counter() - start)
+            if backend == reference:
+                reference_frames = frames
+            else:
+                frame_count_mismatches[backend] += len(frames) != len(reference_frames)
+                pixel_diffs[backend].extend(np.abs(frame.astype(np.int16) - reference_frame).mean() # Over the common frames of mismatched videos too
+                                            for frame, reference_frame in zip(frames, reference_frames))
+
+    print(f'{len(video_paths)} videos, window [{args.start}, {args.end}], resize {args.resize}, reference: {reference}')
+    print(f'{"backend":<10}{"s/video":>10}{"speedup":>10}{"mean |diff|":>14}{"max |diff|":>12}{"count mismatch":>16}')
+    for backend in decoders:
+        mean_time = np.mean(wall_times[backend])
+        diffs = pixel_diffs[backend] or [0.0]
+        print(f'{backend:<10}{mean_time:>10.3f}{np.mean(wall_times[reference]) / mean_time:>9.2f}x'
+              f'{np.mean(diffs):>14.3f}{np.max(diffs):>12.3f}{frame_count_mismatches[backend]:>16}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+from typing import Callable, List, Tuple
+
+from src.file_index import FileIndex
+
+def create_parser():
+    """
+    Creates an argparse instance for the file discovery benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Compare recursive glob discovery with the scandir file index on an AIHub-shaped tree of empty files.')
+    parser.add_argument('--num_videos', type=int, default=20000,
+                        help='Number of json / mp4 pairs.')
+    parser.add_argument('--videos_per_folder', type=int, default=500,
+                        help='Number of files per sub folder of the source tree.')
+    parser.add_argument('--frame_folders', type=int, default=2000,
+                        help='Number of frame folders in the Video output folder.')
+    parser.add_argument('--frames', type=int, default=100,
+                        help='Number of frames per frame folder.')
+    parser.add_argument('--root_path', type=str, default=None,
+                        help='Folder for the generated tree, e.g. on network storage (default: a temporary folder).')
+    return parser
+
+def _touch(path: str) -> None:
+    with open(path, 'wb'):
+        pass
+
+def _create_tree(root_path: str, num_videos: int, videos_per_folder: int, frame_folders: int, frames: int) -> Tuple[str, str, str]:
+    json_directory = os.path.join(root_path, '01.데이터', '1.Training', '라벨링데이터', '03_JSON_TrL', '2.untact_morpheme')
+    video_directory = os.path.join(root_path, '01.데이터', '1.Training', '원천데이터', '1.mp4', '3.crowd')
+    frame_root = os.path.join(root_path, 'result', 'Train', 'Video')
+    for i in range(num_videos):
+        for directory, extension in ((json_directory, 'json'), (video_directory, 'mp4')):
+            folder = os.path.join(directory, f'{i // videos_per_folder:04}')
+            os.makedirs(folder, exist_ok=True)
+            _touch(os.path.join(folder, f'NIA_SL_{i:06}.{extension}'))
+    for i in range(frame_folders):
+        folder = os.path.join(frame_root, f'NIA_SL_{i:06}')
+        os.makedirs(folder)
+        for frame in range(frames):
+            _touch(os.path.join(folder, f'frame_{frame:04}.jpg'))
+    return json_directory, video_directory, frame_root
+
+def _glob_discovery(json_directory: str, video_directory: str) -> List[str]:
+    # Discovery before the file index: two recursive globs and a basename per path for every lookup
+    def name(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+    json_paths = sorted(glob.glob(f'{json_directory}/**/*.json', recursive=True))
+    video_paths = sorted(glob.glob(f'{video_directory}/**/*.mp4', recursive=True))
+    matching = {name(p) for p in json_paths} & {name(p) for p in video_paths}
+    json_paths = [p for p in json_paths if name(p) in matching]
+    label_paths = sorted(glob.glob(f'{json_directory}/**/*.json', recursive=True)) # Walked again by the label stage
+    return [p for p in video_paths if name(p) in matching] + json_paths + label_paths
+
+def _glob_frames(frame_root: str) -> int:
+    # Frame listing before the file index: a glob per folder for keypoints, listdir per folder for the language stage
+    names = [name for name in os.listdir(frame_root) if os.path.isdir(os.path.join(frame_root, name))]
+    frames = [sorted(glob.glob(f'{os.path.join(frame_root, name)}/*.jpg')) for name in names]
+    counts = [len(os.listdir(os.path.join(frame_root, name))) for name in names]
+    return len(frames) + len(counts)
+
+def _scandir_frames(frame_root: str) -> int:
+    counts = FileIndex.count_folder_files(frame_root)
+    frames = [FileIndex.list_frames(os.path.join(frame_root, name), 'jpg') for name in counts]
+    return len(frames) + len(counts)
+
+def _time(function: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main():
+    args = create_parser().parse_args()
+    root_path = args.root_path or tempfile.mkdtemp(prefix='ssl_discovery_')
+    try:
+        json_directory, video_directory, frame_root = _create_tree(root_path, args.num_videos, args.videos_per_folder, args.frame_folders, args.frames)
+        index_path = os.path.join(root_path, 'file_index.json')
+        source_directories = {'json': json_directory, 'mp4': video_directory}
+
+        timings = {
+            'glob discovery': _time(lambda: _glob_discovery(json_directory, video_directory)),
+            'scandir index': _time(lambda: FileIndex(source_directories).get_matching_ids()),
+            'scandir index (saved)': _time(lambda: FileIndex(source_directories, index_path).get_matching_ids()),
+            'cached index': _time(lambda: FileIndex(source_directories, index_path).get_matching_ids()),
+            'glob frames': _time(lambda: _glob_frames(frame_root)),
+            'scandir frames': _time(lambda: _scandir_frames(frame_root)),
+        }
+        print(f'{args.num_videos} json / mp4 pairs, {args.frame_folders} frame folders of {args.frames} frames (all runs read a warm OS cache)')
+        for name, seconds in timings.items():
+            print(f'{name:<24}{seconds:>8.3f}s')
+    finally:
+        if args.root_path is None:
+            shutil.rmtree(root_path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
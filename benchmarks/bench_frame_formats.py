@@ -0,0 +1,98 @@
+import os
+import glob
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from src.frame_store import FRAME_STORES
+from src.video_decoder import OpenCVDecoder
+from src.video_metadata import VideoMetadataIndex
+
+def create_parser():
+    """
+    Creates an argparse instance for the frame storage format benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Compare file count, size, write and read time and fidelity of the Video folder frame formats.')
+    parser.add_argument('--video_path', type=str, required=True,
+                        help='An mp4 file or a folder searched recursively for mp4 files, e.g. the data of benchmarks.synthetic_dataset.')
+    parser.add_argument('--num_videos', type=int, default=10,
+                        help='Maximum number of videos to decode.')
+    parser.add_argument('--formats', type=str, nargs='+', choices=list(FRAME_STORES), default=list(FRAME_STORES),
+                        help='Frame formats to compare.')
+    parser.add_argument('--resize', type=int, default=256,
+                        help='Dimension to which frames are resized (in pixels).')
+    parser.add_argument('--frame_crf', type=int, default=10,
+                        help='Constant rate factor of the mp4 format.')
+    parser.add_argument('--random_reads', type=int, default=100,
+                        help='Number of single frames read at random positions of each format.')
+    return parser
+
+def _count_files(path: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(path))
+
+def _get_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def main():
+    args = create_parser().parse_args()
+    video_paths = [args.video_path] if os.path.isfile(args.video_path) else sorted(path for path in glob.glob(f'{args.video_path}/**/*.mp4', recursive=True) if os.path.isfile(path)) # Not the AIHub '1.mp4' folder
+    video_paths = video_paths[:args.num_videos]
+
+    decoder = OpenCVDecoder()
+    videos: Dict[str, List[np.ndarray]] = {}
+    fps: Dict[str, float] = {}
+    for video_path in video_paths: # Decoded once, every format stores the same frames
+        video_metadata = VideoMetadataIndex.probe(video_path)
+        if not video_metadata.get('fps'): # Unreadable video
+            continue
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        videos[video_name] = list(decoder.iter_frames(video_path, 0, -1, 0, args.resize, video_metadata))
+        fps[video_name] = video_metadata['fps']
+    num_frames = sum(len(frames) for frames in videos.values())
+    rng = random.Random(0)
+    random_frames = [(video_name, rng.randrange(len(videos[video_name])))
+                     for video_name in rng.choices([name for name in videos if videos[name]], k=args.random_reads)]
+
+    work_path = tempfile.mkdtemp(prefix='ssl_frames_')
+    try:
+        print(f'{len(videos)} videos, {num_frames} frames of {args.resize}x{args.resize}')
+        print(f'{"format":<8}{"files":>8}{"MB":>10}{"write s":>10}{"read s":>10}{"random ms":>12}{"PSNR dB":>10}')
+        for frame_format in args.formats:
+            store = FRAME_STORES[frame_format](crf=args.frame_crf)
+            video_root = os.path.join(work_path, frame_format)
+            os.makedirs(video_root)
+
+            start = time.perf_counter()
+            for video_name, frames in videos.items():
+                writer = store.open_writer(store.get_path(video_root, video_name), fps[video_name])
+                for frame in frames:
+                    writer.write(frame)
+                writer.close()
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            squared_error = 0.0
+            for video_name, frames in videos.items():
+                for frame, read_frame in zip(frames, store.read_frames(store.get_path(video_root, video_name))):
+                    squared_error += np.mean((frame.astype(np.float64) - read_frame) ** 2)
+            read_time = time.perf_counter() - start
+            mse = squared_error / max(num_frames, 1)
+            psnr = float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+            start = time.perf_counter()
+            for video_name, index in random_frames:
+                store.read_frame(store.get_path(video_root, video_name), index)
+            random_time = (time.perf_counter() - start) / max(len(random_frames), 1)
+
+            print(f'{frame_format:<8}{_count_files(video_root):>8}{_get_size(video_root) / 2 ** 20:>10.1f}'
+                  f'{write_time:>10.2f}{read_time:>10.2f}{random_time * 1000:>12.2f}{psnr:>10.1f}')
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from src.keypoint_extractor import KeypointExtractor
+
+def create_parser():
+    """
+    Creates an argparse instance for the landmark conversion micro-benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Compare per-frame landmark conversion overhead before and after vectorization.')
+    parser.add_argument('--frames', type=int, default=400,
+                        help='Number of frames per simulated video.')
+    parser.add_argument('--videos', type=int, default=20,
+                        help='Number of simulated videos.')
+    parser.add_argument('--miss_rate', type=float, default=0.2,
+                        help='Probability that a part (pose / hand) is not detected in a frame.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the simulated detections.')
+    return parser
+
+def _fake_landmarks(num_landmarks: int, miss_rate: float) -> Optional[SimpleNamespace]:
+    if random.random() < miss_rate:
+        return None
+    return SimpleNamespace(landmark=[SimpleNamespace(x=random.random(), y=random.random(), visibility=random.random())
+                                     for _ in range(num_landmarks)])
+
+def _fake_results(num_frames: int, miss_rate: float) -> List[Tuple[Any, Tuple[int, int, int]]]:
+    return [(SimpleNamespace(pose_landmarks=_fake_landmarks(33, miss_rate),
+                             left_hand_landmarks=_fake_landmarks(21, miss_rate),
+                             right_hand_landmarks=_fake_landmarks(21, miss_rate)), (256, 256, 3))
+            for _ in range(num_frames)]
+
+def _baseline_convert(frame_results: List[Tuple[Any, Tuple[int, int, int]]]) -> np.ndarray:
+    # Per-landmark loop used before vectorization, kept here as the reference implementation
+    num_frames = len(frame_results)
+    left_hand_keypoints = np.zeros((1, num_frames, 33, 3))
+    right_hand_keypoints = np.zeros((1, num_frames, 33, 3))
+    body_keypoints = np.zeros((1, num_frames, 33, 3))
+    for time_step, (results, (image_height, image_width, _)) in enumerate(frame_results):
+        for i in range(33):
+            try:
+                pose_keypoint = results.pose_landmarks.landmark[i]
+                body_keypoints[:, time_step, i, :] = np.array([pose_keypoint.x * image_width, pose_keypoint.y * image_height, pose_keypoint.visibility])
+            except:
+                if time_step > 0:
+                    body_keypoints[:, time_step, i, :] = body_keypoints[:, time_step - 1, i, :]
+            if i <= 20:
+                for hand_landmarks, hand_keypoints in ((results.right_hand_landmarks, right_hand_keypoints), (results.left_hand_landmarks, left_hand_keypoints)):
+                    if hand_landmarks:
+                        hand_landmark = hand_landmarks.landmark[i]
+                        hand_keypoints[:, time_step, i, :] = np.array([hand_landmark.x * image_width, hand_landmark.y * image_height, 1])
+    keypoints_concat = np.concatenate([left_hand_keypoints, right_hand_keypoints, body_keypoints], axis=0)
+    return np.transpose(keypoints_concat, (3, 1, 2, 0))
+
+def main():
+    args = create_parser().parse_args()
+    random.seed(args.seed)
+    videos = [_fake_results(args.frames, args.miss_rate) for _ in range(args.videos)]
+    extractor = KeypointExtractor.__new__(KeypointExtractor) # Conversion does not read the command-line arguments
+
+    timings, outputs = {}, {}
+    for name, convert in (('baseline', _baseline_convert), ('vectorized', lambda results: extractor._to_legacy_layout(*extractor._convert_results(results, len(results))))):
+        start = time.perf_counter()
+        outputs[name] = [convert(results) for results in videos]
+        timings[name] = (time.perf_counter() - start) / (args.frames * args.videos)
+
+    max_diff = max(np.abs(baseline - vectorized).max() for baseline, vectorized in zip(outputs['baseline'], outputs['vectorized']))
+    print(f"frames: {args.frames * args.videos}, miss rate: {args.miss_rate}")
+    print(f"baseline   : {timings['baseline'] * 1e6:8.1f} us/frame")
+    print(f"vectorized : {timings['vectorized'] * 1e6:8.1f} us/frame")
+    print(f"speedup    : {timings['baseline'] / timings['vectorized']:8.1f}x (max abs diff {max_diff:.3g})")
+
+if __name__ == "__main__":
+    main()
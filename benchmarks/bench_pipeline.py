@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic_dataset import generate_dataset
+from src.args import get_args
+from src.sign_processor import SignProcessor
+
+def create_parser():
+    """
+    Creates an argparse instance for the end-to-end pipeline benchmark.
+    Unknown arguments (e.g. --model_complexity 1 --decode_backend opencv) are passed on to the preprocessing.
+    """
+    parser = argparse.ArgumentParser(description='Time each preprocessing stage and the full pipeline on a synthetic dataset for several --mp values.')
+    parser.add_argument('--data_path', type=str, default='./benchmark_data',
+                        help='Folder of the synthetic dataset, generated if missing or generated with other settings.')
+    parser.add_argument('--work_path', type=str, default=None,
+                        help='Folder for the preprocessing results (default: a temporary folder).')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the preprocessing results after the benchmark.')
+    parser.add_argument('--num_videos', type=int, default=32,
+                        help='Number of synthetic videos.')
+    parser.add_argument('--seconds', type=float, nargs=2, default=[3.0, 6.0],
+                        help='Minimum and maximum duration of the synthetic videos (in seconds).')
+    parser.add_argument('--width', type=int, default=1920,
+                        help='Width of the synthetic videos (in pixels).')
+    parser.add_argument('--height', type=int, default=1080,
+                        help='Height of the synthetic videos (in pixels).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed of the synthetic dataset.')
+    parser.add_argument('--mp', type=int, nargs='+', default=[1, 2, 4],
+                        help='Worker counts to compare, the first one is the baseline for the scaling efficiency.')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per worker count, the fastest run is reported.')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Optional JSON file for the results.')
+    return parser
+
+def _timed_run(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def _run_stages(sign_processor: SignProcessor) -> Dict[str, float]:
+    stages = {'discovery': sign_processor._share_file_index, 'label': sign_processor.label_processor.process}
+    if sign_processor.video_processor.args.fused:
+        stages['fused'] = sign_processor.fused_processor.process
+    else:
+        stages['video'] = sign_processor.video_processor.process
+        stages['keypoint'] = sign_processor.keypoint_extractor.process
+    stages['language'] = sign_processor.language_processor.process
+
+    sign_processor._prepare_directory_structure(sign_processor.video_processor.args.save_path)
+    return {stage: _timed_run(process) for stage, process in stages.items()}
+
+def _benchmark(data_path: str, save_path: str, num_workers: int, processor_argv: List[str]) -> Dict[str, float]:
+    def create_sign_processor(run: str) -> SignProcessor:
+        return SignProcessor(get_args(['--root_path', data_path, '--save_path', os.path.join(save_path, run),
+                                       '--mp', str(num_workers), *processor_argv]))
+
+    timings = _run_stages(create_sign_processor('stages')) # Each stage on its own, always with the sequential scheduler
+    sign_processor = create_sign_processor('full') # A fresh folder, so the manifest does not skip any video
+    timings['full'] = _timed_run(sign_processor.start)
+    timings['videos'] = len(sign_processor.video_processor.find_matching_files()[1])
+    return timings
+
+def main():
+    args, processor_argv = create_parser().parse_known_args()
+    logging.basicConfig(level=logging.WARNING)
+    processing_type = get_args(['--root_path', args.data_path, *processor_argv]).processing_type # Also rejects invalid arguments before generating
+    generated = generate_dataset(args.data_path, args.num_videos, [processing_type], args.seconds, [30, 30, 30, 25],
+                                 args.width, args.height, args.seed)
+    print(f'{"Generated" if generated else "Reused"} {args.num_videos} synthetic videos per split in {args.data_path}')
+
+    work_path = args.work_path or tempfile.mkdtemp(prefix='ssl_benchmark_')
+    results = {}
+    try:
+        for num_workers in args.mp:
+            runs = [_benchmark(args.data_path, os.path.join(work_path, f'mp{num_workers}_run{run}'), num_workers, processor_argv)
+                    for run in range(args.repeat)]
+            results[num_workers] = {key: min(run[key] for run in runs) for key in runs[0]}
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    baseline_workers = args.mp[0]
+    baseline_throughput = results[baseline_workers]['videos'] / results[baseline_workers]['full']
+    stages = [key for key in results[baseline_workers] if key not in ('full', 'videos')]
+    print(f'{"mp":>4}' + ''.join(f'{stage + " s":>12}' for stage in stages) + f'{"full s":>10}{"videos/s":>10}{"speedup":>9}{"efficiency":>12}')
+    for num_workers, timings in results.items():
+        throughput = timings['videos'] / timings['full']
+        timings['videos_per_sec'] = throughput
+        timings['speedup'] = throughput / baseline_throughput
+        timings['scaling_efficiency'] = timings['speedup'] * baseline_workers / num_workers # 1.0 means linear scaling
+        print(f'{num_workers:>4}' + ''.join(f'{timings[stage]:>12.2f}' for stage in stages) +
+              f'{timings["full"]:>10.2f}{throughput:>10.2f}{timings["speedup"]:>8.2f}x{timings["scaling_efficiency"]:>12.2f}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'settings': {**vars(args), 'processor_args': processor_argv}, 'results': results}, output_file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import json
+import random
+import shutil
+import argparse
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+# (data folder, label folder) of each split, as laid out in the AIHub download
+SPLIT_FOLDERS = {'train': ('1.Training', '03_JSON_TrL'), 'valid': ('2.Validation', '03_JSON_VL')}
+GLOSSES = [f'GLOSS_{i:03}' for i in range(200)]
+MARKER_FILE = 'synthetic_dataset.json'
+
+def create_parser():
+    """
+    Creates an argparse instance for the synthetic dataset generator.
+    """
+    parser = argparse.ArgumentParser(description='Generate a small AIHub-shaped dataset of mp4 videos and label JSON files.')
+    parser.add_argument('--root_path', type=str, required=True,
+                        help='Folder in which the synthetic dataset is generated.')
+    parser.add_argument('--num_videos', type=int, default=32,
+                        help='Number of videos per split.')
+    parser.add_argument('--splits', type=str, nargs='+', choices=list(SPLIT_FOLDERS), default=['train'],
+                        help='Splits to generate.')
+    parser.add_argument('--seconds', type=float, nargs=2, default=[3.0, 6.0],
+                        help='Minimum and maximum video duration (in seconds).')
+    parser.add_argument('--fps', type=int, nargs='+', default=[30, 30, 30, 25],
+                        help='Frame rates picked from at random for each video.')
+    parser.add_argument('--width', type=int, default=1920,
+                        help='Width of the videos (in pixels).')
+    parser.add_argument('--height', type=int, default=1080,
+                        help='Height of the videos (in pixels).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed, the same seed and arguments generate the same dataset.')
+    return parser
+
+def _draw_frame(width: int, height: int, time_step: int, fps: int) -> np.ndarray:
+    # A signer-like figure with moving hands in front of a flat background
+    frame = np.full((height, width, 3), (90, 110, 120), dtype=np.uint8)
+    center_x, unit = width // 2, height // 10
+    phase = 2 * np.pi * time_step / fps
+    cv2.circle(frame, (center_x, int(2.5 * unit)), unit, (150, 180, 220), -1) # Head
+    cv2.rectangle(frame, (center_x - int(1.5 * unit), int(3.6 * unit)), (center_x + int(1.5 * unit), height), (60, 60, 60), -1) # Body
+    for side in (-1, 1):
+        hand = (center_x + side * int((2 + np.sin(phase)) * unit), int((5 + side * np.cos(phase)) * unit))
+        cv2.line(frame, (center_x + side * int(1.5 * unit), int(4 * unit)), hand, (60, 60, 60), unit // 3)
+        cv2.circle(frame, hand, unit // 3, (150, 180, 220), -1) # Hands
+    return frame
+
+def _write_video(video_path: str, num_frames: int, fps: int, width: int, height: int) -> None:
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    try:
+        for time_step in range(num_frames):
+            writer.write(_draw_frame(width, height, time_step, fps))
+    finally:
+        writer.release()
+
+def _create_label(video_id: str, duration: float, num_frames: int, width: int, height: int, rng: random.Random) -> Dict[str, Any]:
+    sign_start, sign_end = min(1.0, duration / 4), max(duration - 1.0, duration * 3 / 4)
+    bounds = sorted(rng.uniform(sign_start, sign_end) for _ in range(2 * rng.randint(2, 6)))
+    gestures = [{'start': round(start, 3), 'end': round(end, 3), 'gloss_id': rng.choice(GLOSSES)} for start, end in zip(bounds[::2], bounds[1::2])]
+    gestures[0]['start'], gestures[-1]['end'] = round(sign_start, 3), round(sign_end, 3)
+    hands = [rng.choice(['sign_gestures_both', 'sign_gestures_strong', 'sign_gestures_weak']) for _ in gestures]
+    return {
+        'metadata': {'id': video_id},
+        'korean_text': ' '.join(f'단어{rng.randint(0, 99)}' for _ in range(rng.randint(3, 10))),
+        'sign_script': {hand: [gesture for gesture, gesture_hand in zip(gestures, hands) if gesture_hand == hand]
+                        for hand in ('sign_gestures_both', 'sign_gestures_strong', 'sign_gestures_weak')},
+        'landmarks': {'pose_keypoints_2d': [[value for _ in range(25) for value in (rng.uniform(0, width), rng.uniform(0.25, 0.95) * height, rng.random())]
+                                            for _ in range(num_frames)]}, # x, y, confidence of 25 keypoints per frame
+    }
+
+def generate_dataset(root_path: str, num_videos: int, splits: List[str], seconds: List[float], fps: List[int],
+                     width: int, height: int, seed: int) -> bool:
+    """
+    Generates the dataset unless the same one already exists in `root_path`. Returns whether it was generated.
+    """
+    settings = {'num_videos': num_videos, 'splits': sorted(splits), 'seconds': list(seconds), 'fps': list(fps),
+                'width': width, 'height': height, 'seed': seed}
+    marker_path = os.path.join(root_path, MARKER_FILE)
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r', encoding='utf-8') as marker_file:
+            if json.load(marker_file) == settings:
+                return False
+
+    for split in splits:
+        rng = random.Random(f'{seed}-{split}')
+        data_folder, label_folder = SPLIT_FOLDERS[split]
+        video_directory = os.path.join(root_path, '01.데이터', data_folder, '원천데이터', '1.mp4', '3.crowd', 'synthetic')
+        json_directory = os.path.join(root_path, '01.데이터', data_folder, '라벨링데이터', label_folder, '2.untact_morpheme', 'synthetic')
+        for directory in (video_directory, json_directory):
+            if os.path.isdir(directory):
+                shutil.rmtree(directory) # Files of a dataset generated with other settings
+            os.makedirs(directory)
+        for i in range(num_videos):
+            video_id = f'NIA_SL_SYN{data_folder[0]}{i:05}'
+            video_fps = rng.choice(fps)
+            duration = rng.uniform(*seconds)
+            num_frames = int(duration * video_fps)
+            _write_video(os.path.join(video_directory, f'{video_id}.mp4'), num_frames, video_fps, width, height)
+            with open(os.path.join(json_directory, f'{video_id}.json'), 'w', encoding='utf-8') as json_file:
+                json.dump(_create_label(video_id, num_frames / video_fps, num_frames, width, height, rng), json_file, ensure_ascii=False)
+
+    with open(marker_path, 'w', encoding='utf-8') as marker_file:
+        json.dump(settings, marker_file)
+    return True
+
+def main():
+    args = create_parser().parse_args()
+    generated = generate_dataset(args.root_path, args.num_videos, args.splits, args.seconds, args.fps, args.width, args.height, args.seed)
+    print(f'{"Generated" if generated else "Reused"} {args.num_videos} videos per split in {args.root_path}')
+
+if __name__ == "__main__":
+    main()
@@ -41,19 +41,96 @@ def create_parser():
                         help='Image file extension (jpg or png).')
     parser.add_argument('--resize', type=int, default=256,
                         help='Dimension to which images will be resized (in pixels).')
+    parser.add_argument('--frame_format', type=str, choices=['images', 'npy', 'mp4'], default='images',
+                        help='How the Video folder keeps the frames of a video: a folder of --extension images, one uint8 npy array or one re-encoded mp4 clip.')
+    parser.add_argument('--frame_crf', type=int, default=10,
+                        help='Constant rate factor of the libx264 encoder for --frame_format mp4 (0 is lossless, higher is smaller).')
+    
+    # Argument for video decoding settings
+    parser.add_argument('--decode_backend', type=str, choices=['moviepy', 'opencv', 'pyav'], default='moviepy',
+                        help='Library used to decode, crop and resize videos (pyav requires PyAV to be installed).')
+
+    # Arguments for keypoint output settings
+    parser.add_argument('--keypoint_format', type=str, choices=['legacy', 'compact'], default='legacy',
+                        help='Keypoint npy layout: legacy (3, frame, 33, 3) float64 or compact (frame, 21 + 21 + 33, 3) in --keypoint_dtype.')
+    parser.add_argument('--keypoint_dtype', type=str, choices=['float32', 'float16'], default='float32',
+                        help='Data type of compact keypoint files and the keypoint store.')
+    parser.add_argument('--keypoint_store', action='store_true',
+                        help='Pack the keypoints of the split into a sharded, memory-mappable store in the KeypointStore folder.')
+    parser.add_argument('--store_shard_size', type=int, default=1000,
+                        help='Number of videos per keypoint store shard.')
+    parser.add_argument('--model_complexity', type=int, choices=[0, 1, 2], default=2,
+                        help='Complexity of the MediaPipe Holistic pose model (0: lite, 1: full, 2: heavy).')
+
+    # Arguments for language output settings
+    parser.add_argument('--language_format', type=str, choices=['json', 'jsonl'], default='json',
+                        help='Format of the Language output: one json object per split or JSON Lines (one row per line).')
+    parser.add_argument('--language_shard_size', type=int, default=0,
+                        help='Number of rows per Language output file, 0 to write the whole split to one file.')
+
+    # Arguments for token export settings
+    parser.add_argument('--export_tokens', action='store_true',
+                        help='Export the gloss sequences and Korean texts as int32 token ids with offsets in the Tokens folder.')
+    parser.add_argument('--text_tokenizer', type=str, choices=['space', 'char'], default='space',
+                        help='Tokenization of the Korean text for the token export: space separated words or characters.')
+    parser.add_argument('--gloss_vocab_path', type=str, default=None,
+                        help='Gloss vocab file to encode with, e.g. Train.vocab when exporting Validation (default: the vocab of the split).')
+    parser.add_argument('--text_vocab_path', type=str, default=None,
+                        help='Text vocab file to encode with, e.g. Train/Tokens/text.vocab when exporting Validation (default: built from the split).')
+
+    # Arguments for fused pipeline settings
+    parser.add_argument('--fused', action='store_true',
+                        help='Feed decoded frames straight to MediaPipe so each mp4 is processed into keypoints in a single pass.')
+    parser.add_argument('--frame_writer', type=str, choices=['sync', 'async', 'none'], default='sync',
+                        help='How cropped frames are written to the Video folder: sync, async (background thread) or none (fused mode only).')
     
     # Argument for multiprocessing thread count
     parser.add_argument('--mp', type=int, default=mp.cpu_count(),
                         help='Number of threads for multiprocessing.')
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help='Number of videos handed to a worker process at once.')
+    parser.add_argument('--io_threads', type=int, default=0,
+                        help='Threads per worker that read (or, in fused mode, decode) frames ahead of MediaPipe, 0 to read them in the inference thread.')
+    parser.add_argument('--prefetch_frames', type=int, default=32,
+                        help='Maximum number of frames read ahead of MediaPipe when --io_threads is set.')
+
+    # Argument for file discovery settings
+    parser.add_argument('--file_index_cache', action='store_true',
+                        help='Persist the discovered json and mp4 paths in file_index.json and reuse them while the source folders are unchanged.')
+
+    # Argument for profiling settings
+    parser.add_argument('--profile_sample_rate', type=float, default=0.0,
+                        help='Fraction of videos (0 to 1) run under cProfile, with the profiles saved in the reports folder.')
+
+    # Arguments for pipelined scheduling settings
+    parser.add_argument('--scheduler', type=str, choices=['sequential', 'pipelined'], default='sequential',
+                        help='Run the stages one after another over the whole split (sequential) or stream each video through all stages (pipelined).')
+    parser.add_argument('--queue_size', type=int, default=4,
+                        help='Maximum number of videos waiting between two stages of the pipelined scheduler.')
+    parser.add_argument('--probe_workers', type=int, default=None,
+                        help='Number of metadata probe processes of the pipelined scheduler (default: 1).')
+    parser.add_argument('--decode_workers', type=int, default=None,
+                        help='Number of decode/crop processes of the pipelined scheduler (default: half of the --mp processes left after probing, all of them with --fused).')
+    parser.add_argument('--keypoint_workers', type=int, default=None,
+                        help='Number of keypoint extraction processes of the pipelined scheduler (default: the rest of the --mp processes).')
     
     return parser
 
-def get_args():
+def get_args(argv=None):
     """
     Parses and returns the command-line arguments using the created parser.
+    `argv` defaults to the arguments of the command line.
     """
     parser = create_parser()
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.queue_size < 1:
+        parser.error('--queue_size must be at least 1, the pipelined scheduler can not hand any video to the next stage otherwise.')
+    for stage in ['probe', 'decode', 'keypoint']:
+        if getattr(args, f'{stage}_workers') is not None and getattr(args, f'{stage}_workers') < 1:
+            parser.error(f'--{stage}_workers must be at least 1.')
+    if args.frame_writer == 'none' and not args.fused:
+        parser.error('--frame_writer none requires --fused, since keypoint extraction reads frames from the Video folder.')
+    return args
 
 if __name__ == "__main__":
     args = get_args()
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+
+FILE_TYPES = ['json', 'mp4']
+
+class FileIndex:
+    """
+    Label JSON and source mp4 paths of a split keyed by video id, found by a single os.scandir walk of each source folder.
+    With an `index_path`, the paths are persisted and reused while the modification times of the walked folders are
+    unchanged, so a rerun only stats the folders instead of listing every file.
+    """
+    def __init__(self, source_directories: Dict[str, str], index_path: Optional[str] = None) -> None:
+        self.source_directories = source_directories # {file type: folder}
+        self.index_path = index_path
+        self.paths: Dict[str, Dict[str, str]] = {}
+        self.directory_mtimes: Dict[str, int] = {}
+        self._load()
+
+    @staticmethod
+    def _scan(directory: str, extension: str, paths: Dict[str, str], directory_mtimes: Dict[str, int]) -> None:
+        directories = [directory]
+        while directories:
+            current = directories.pop()
+            try:
+                directory_mtimes[current] = os.stat(current).st_mtime_ns
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            directories.append(entry.path)
+                        elif entry.name.endswith(extension):
+                            video_id = entry.name[:-len(extension)]
+                            if video_id not in paths or entry.path < paths[video_id]: # The same file in two folders, keep one deterministically
+                                paths[video_id] = entry.path
+            except FileNotFoundError: # A missing source folder has no files, like an empty glob
+                continue
+
+    @staticmethod
+    def list_frames(folder_path: str, extension: str) -> List[str]:
+        with os.scandir(folder_path) as entries:
+            return sorted(entry.path for entry in entries if entry.name.endswith(f'.{extension}'))
+
+    @staticmethod
+    def count_folder_files(root_path: str) -> Dict[str, int]:
+        counts = {}
+        with os.scandir(root_path) as folders:
+            for folder in folders:
+                if folder.is_dir():
+                    with os.scandir(folder.path) as entries:
+                        counts[folder.name] = sum(1 for _ in entries)
+        return counts
+
+    def _is_stale(self) -> bool:
+        for directory, mtime in self.directory_mtimes.items(): # Adding or removing a file changes the mtime of its folder
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        if self.index_path is not None and os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as index_file:
+                index = json.load(index_file)
+            if index['source_directories'] == self.source_directories:
+                self.paths, self.directory_mtimes = index['paths'], index['directory_mtimes']
+                if not self._is_stale():
+                    logging.info(f'File discovery: {self._describe()} reused from {self.index_path} in {time.perf_counter() - start:.2f}s')
+                    return
+
+        self.paths, self.directory_mtimes = {}, {}
+        for file_type, directory in self.source_directories.items():
+            self.paths[file_type] = {}
+            self._scan(directory, f'.{file_type}', self.paths[file_type], self.directory_mtimes)
+        logging.info(f'File discovery: {self._describe()} found in {time.perf_counter() - start:.2f}s')
+        if self.index_path is not None:
+            self.save()
+
+    def _describe(self) -> str:
+        return ', '.join(f'{len(paths)} {file_type}' for file_type, paths in self.paths.items())
+
+    def get_paths(self, file_type: str) -> Dict[str, str]:
+        return self.paths[file_type]
+
+    def get_matching_ids(self) -> List[str]:
+        return sorted(self.paths['json'].keys() & self.paths['mp4'].keys()) # intersection of json and video
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(f'{self.index_path}.tmp', 'w', encoding='utf-8') as index_file:
+            json.dump({'source_directories': self.source_directories, 'directory_mtimes': self.directory_mtimes,
+                       'paths': self.paths}, index_file, ensure_ascii=False)
+        os.replace(f'{self.index_path}.tmp', self.index_path)
@@ -0,0 +1,62 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+_END = object() # Marks the end of a prefetched iterable
+
+def prefetch_map(function: Callable[[Any], Any], items: Iterable[Any], num_threads: int, prefetch: int) -> Iterator[Any]:
+    """
+    Yields `function(item)` for every item in order, computed by `num_threads` background threads
+    that stay up to `prefetch` items ahead of the consumer.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        pending = deque(executor.submit(function, item) for _, item in zip(range(max(prefetch, 1)), items))
+        while pending:
+            result = pending.popleft().result()
+            for item in items: # Keep the window full
+                pending.append(executor.submit(function, item))
+                break
+            yield result
+
+def prefetch_iter(iterable: Iterable[Any], prefetch: int) -> Iterator[Any]:
+    """
+    Yields the items of `iterable`, produced by a background thread that stays up to `prefetch` items ahead of the consumer.
+    Errors of the producer are raised in the consumer.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(prefetch, 1))
+    stopped = threading.Event()
+
+    def put(entry: Any) -> bool:
+        while not stopped.is_set(): # Give up once the consumer stopped early
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as error:
+            put((_END, error))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
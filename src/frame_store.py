@@ -0,0 +1,276 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .file_index import FileIndex
+from .frame_prefetch import prefetch_iter, prefetch_map
+from .keypoint_store import read_npy_shape
+
+MP4_KEYFRAME_INTERVAL = 16 # Frames decoded at most to reach a random frame of a re-encoded clip
+
+class FrameWriter(ABC):
+    """
+    Writes the frames of one video, `close` finishes the output and returns the number of bytes written.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.num_frames = 0
+
+    @abstractmethod
+    def write(self, frame: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> int:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+class ImageFrameWriter(FrameWriter):
+    def __init__(self, path: str, extension: str) -> None:
+        super().__init__(path)
+        self.extension = extension
+        self.bytes_written = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, frame: np.ndarray) -> None:
+        frame_path = os.path.join(self.path, f"frame_{int(self.num_frames):04}.{self.extension}")
+        Image.fromarray(frame).save(frame_path)
+        self.bytes_written += os.path.getsize(frame_path)
+        self.num_frames += 1
+
+    def close(self) -> int:
+        return self.bytes_written
+
+class NpyFrameWriter(FrameWriter):
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.frames: List[np.ndarray] = [] # At most max_frame frames, longer videos are skipped before decoding
+
+    def write(self, frame: np.ndarray) -> None:
+        self.frames.append(frame)
+        self.num_frames += 1
+
+    def close(self) -> int:
+        shape = (self.num_frames, *self.frames[0].shape) if self.frames else (0, 0, 0, 3)
+        array = np.lib.format.open_memmap(f'{self.path}.tmp', mode='w+', dtype=np.uint8, shape=shape)
+        for i, frame in enumerate(self.frames):
+            array[i] = frame
+        array.flush()
+        del array
+        self.frames = []
+        os.replace(f'{self.path}.tmp', self.path)
+        return os.path.getsize(self.path)
+
+    def abort(self) -> None:
+        self.frames = []
+        if os.path.exists(f'{self.path}.tmp'):
+            os.remove(f'{self.path}.tmp')
+
+class Mp4FrameWriter(FrameWriter):
+    def __init__(self, path: str, fps: float, crf: int) -> None:
+        super().__init__(path)
+        self.fps = fps
+        self.crf = crf
+        self.encoder: Optional[Any] = None
+
+    def _open_encoder(self, frame: np.ndarray) -> None:
+        import imageio_ffmpeg # Only needed for --frame_format mp4, installed with moviepy
+        height, width, _ = frame.shape
+        self.encoder = imageio_ffmpeg.write_frames(f'{self.path}.tmp', (width, height), fps=self.fps, codec='libx264',
+                                                   pix_fmt_out='yuv444p', macro_block_size=1, # Keep full chroma and odd sizes
+                                                   output_params=['-f', 'mp4', '-crf', str(self.crf), '-g', str(MP4_KEYFRAME_INTERVAL)])
+        self.encoder.send(None) # Start ffmpeg
+
+    def write(self, frame: np.ndarray) -> None:
+        if self.encoder is None:
+            self._open_encoder(frame)
+        self.encoder.send(np.ascontiguousarray(frame))
+        self.num_frames += 1
+
+    def close(self) -> int:
+        if self.encoder is None: # No frames, an empty file stands for an empty clip
+            open(f'{self.path}.tmp', 'wb').close()
+        else:
+            self.encoder.close()
+            self.encoder = None
+        os.replace(f'{self.path}.tmp', self.path)
+        return os.path.getsize(self.path)
+
+    def abort(self) -> None:
+        if self.encoder is not None:
+            self.encoder.close()
+            self.encoder = None
+        if os.path.exists(f'{self.path}.tmp'):
+            os.remove(f'{self.path}.tmp')
+
+class FrameStore(ABC):
+    """
+    Cropped RGB frames of the videos in the Video folder, saved as a folder of images per video (`images`),
+    one uint8 `(frame, resize, resize, 3)` memory-mappable array per video (`npy`) or one re-encoded clip per video (`mp4`).
+    `read_frames` streams a video for keypoint extraction, `read_frame` gives data loaders random access to a single frame.
+    """
+    suffix = ''
+
+    def __init__(self, extension: str = 'jpg', crf: int = 10) -> None:
+        self.extension = extension
+        self.crf = crf
+
+    def get_path(self, video_root: str, video_name: str) -> str:
+        return os.path.join(video_root, f'{video_name}{self.suffix}')
+
+    @abstractmethod
+    def open_writer(self, path: str, fps: float) -> FrameWriter:
+        pass
+
+    @abstractmethod
+    def count_frames(self, path: str) -> int:
+        pass
+
+    def list_videos(self, video_root: str) -> Dict[str, int]:
+        """
+        Returns {video name: number of frames} of the videos saved in `video_root`.
+        """
+        with os.scandir(video_root) as entries:
+            return {entry.name[:-len(self.suffix)]: self.count_frames(entry.path)
+                    for entry in entries if entry.is_file() and entry.name.endswith(self.suffix)}
+
+    def read_frames(self, path: str, num_threads: int = 0, prefetch: int = 32) -> Iterator[np.ndarray]:
+        """
+        Yields the frames of a video in order. With `num_threads`, frames are read in the background up to `prefetch` frames ahead.
+        """
+        frames = self._iter_frames(path)
+        return prefetch_iter(frames, prefetch) if num_threads > 0 else frames
+
+    @abstractmethod
+    def _iter_frames(self, path: str) -> Iterator[np.ndarray]:
+        pass
+
+    @abstractmethod
+    def read_frame(self, path: str, index: int) -> np.ndarray:
+        """
+        Returns frame `index` of a video, raises IndexError if the video has no such frame.
+        """
+
+    @staticmethod
+    def remove(video_root: str, video_name: str) -> None:
+        for store in FRAME_STORES.values(): # Drop the frames of a previous run, which may have another length or format
+            path = store().get_path(video_root, video_name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+class ImageFrameStore(FrameStore):
+    def open_writer(self, path: str, fps: float) -> FrameWriter:
+        return ImageFrameWriter(path, self.extension)
+
+    def _list_frame_paths(self, path: str) -> List[str]:
+        return FileIndex.list_frames(path, self.extension)
+
+    def count_frames(self, path: str) -> int:
+        return len(self._list_frame_paths(path))
+
+    def list_videos(self, video_root: str) -> Dict[str, int]:
+        return FileIndex.count_folder_files(video_root)
+
+    def read_image(self, frame_path: str) -> Optional[np.ndarray]:
+        try:
+            image: np.ndarray = cv2.imread(frame_path, cv2.IMREAD_COLOR)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        except Exception:
+            return None # An unreadable frame, keypoint extraction keeps zero keypoints for it
+
+    def _iter_frames(self, path: str) -> Iterator[Optional[np.ndarray]]:
+        return (self.read_image(frame_path) for frame_path in self._list_frame_paths(path))
+
+    def read_frames(self, path: str, num_threads: int = 0, prefetch: int = 32) -> Iterator[Optional[np.ndarray]]:
+        if num_threads > 0: # Read and decode the next images while MediaPipe runs on the current one
+            return prefetch_map(self.read_image, self._list_frame_paths(path), num_threads, prefetch)
+        return self._iter_frames(path)
+
+    def read_frame(self, path: str, index: int) -> Optional[np.ndarray]:
+        frame_path = os.path.join(path, f"frame_{int(index):04}.{self.extension}")
+        if index < 0 or not os.path.isfile(frame_path):
+            raise IndexError(f'Frame {index} is out of range of {path}')
+        return self.read_image(frame_path)
+
+class NpyFrameStore(FrameStore):
+    suffix = '.npy'
+
+    def open_writer(self, path: str, fps: float) -> FrameWriter:
+        return NpyFrameWriter(path)
+
+    def count_frames(self, path: str) -> int:
+        return read_npy_shape(path)[0]
+
+    def load(self, path: str) -> np.ndarray:
+        """
+        Returns the memory-mapped (frame, resize, resize, 3) array of a video, slicing it only reads the sliced frames.
+        """
+        if self.count_frames(path) == 0: # An empty file can not be memory-mapped
+            return np.load(path)
+        return np.load(path, mmap_mode='r')
+
+    def _iter_frames(self, path: str) -> Iterator[np.ndarray]:
+        yield from self.load(path)
+
+    def read_frame(self, path: str, index: int) -> np.ndarray:
+        return np.array(self.load(path)[index])
+
+class Mp4FrameStore(FrameStore):
+    suffix = '.mp4'
+
+    def open_writer(self, path: str, fps: float) -> FrameWriter:
+        return Mp4FrameWriter(path, fps, self.crf)
+
+    def count_frames(self, path: str) -> int:
+        capture = cv2.VideoCapture(path)
+        try:
+            return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) if capture.isOpened() else 0
+        finally:
+            capture.release()
+
+    def _iter_frames(self, path: str) -> Iterator[np.ndarray]:
+        capture = cv2.VideoCapture(path)
+        try:
+            while capture.isOpened():
+                grabbed, frame = capture.read()
+                if not grabbed:
+                    return
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        finally:
+            capture.release()
+
+    def read_frame(self, path: str, index: int) -> np.ndarray:
+        capture = cv2.VideoCapture(path)
+        try:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(index)) # Decodes from the previous keyframe
+            grabbed, frame = capture.read()
+            if not grabbed:
+                raise IndexError(f'Frame {index} is out of range of {path}')
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        finally:
+            capture.release()
+
+FRAME_STORES = {'images': ImageFrameStore, 'npy': NpyFrameStore, 'mp4': Mp4FrameStore}
+
+def get_frame_store(video_path: str) -> FrameStore:
+    """
+    Returns the store that reads a `video_path` of the Language output, e.g. in a data loader:
+
+        store = get_frame_store(row['video_path'])
+        frame = store.read_frame(row['video_path'], 10)   # (resize, resize, 3) RGB
+    """
+    for store in FRAME_STORES.values():
+        if store.suffix and video_path.endswith(store.suffix):
+            return store()
+    with os.scandir(video_path) as entries: # A folder of images, named like its first frame
+        extension = next((os.path.splitext(entry.name)[1][1:] for entry in entries), 'jpg')
+    return ImageFrameStore(extension)
@@ -0,0 +1,47 @@
+import os
+import logging
+import argparse
+from typing import Any, Dict, Optional
+
+from .frame_prefetch import prefetch_iter
+from .keypoint_extractor import KeypointExtractor
+from .manifest import BuildManifest
+from .telemetry import timed
+from .video_processor import VideoProcessor
+
+class FusedProcessor(VideoProcessor):
+    MANIFEST_STAGE = 'fused'
+    MANIFEST_PARAMS = VideoProcessor.MANIFEST_PARAMS + KeypointExtractor.MANIFEST_PARAMS + ['frame_writer']
+
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
+        self.keypoint_extractor = KeypointExtractor(self.args)
+
+    def init_worker(self) -> None:
+        self.keypoint_extractor.init_worker()
+
+    def _video_to_images(self, start: int, end: int, y_top: int, video_path: str, frame_path: str, 
+                         video_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        video_name = self.get_filename_without_extension(video_path)
+        timings: Dict[str, float] = {}
+        frames = self._write_frames(self._iter_cropped_frames(start, end, y_top, video_path, video_metadata, timings), 
+                                    frame_path, video_metadata['fps'], timings) # Frames go to MediaPipe as they are decoded
+        if self.args.io_threads > 0:
+            frames = prefetch_iter(frames, self.args.prefetch_frames) # Decode the next frames in the background while MediaPipe runs
+        keypoints = self.keypoint_extractor.infer_keypoints(frames, timings=timings)
+        with timed(timings, 'save_time'):
+            keypoint_path = self.keypoint_extractor.save_keypoints(video_name, keypoints)
+        timings['bytes_written'] = timings.get('bytes_written', 0) + os.path.getsize(keypoint_path)
+        output_paths = [keypoint_path] if self.args.frame_writer == 'none' else [keypoint_path, frame_path]
+        outputs = {'files': {path: BuildManifest.fingerprint(path) for path in output_paths}, 'frames': len(keypoints[2])}
+        return {'video': video_name, 'frames': len(keypoints[2]), **timings, 'outputs': outputs}
+
+    def process(self) -> None:
+        logging.info('Fused video & keypoint preprocessing in progress...')
+        self.keypoint_extractor.set_paths()
+        _, video_paths = self.find_matching_files()
+        results = self._process_files(video_paths)
+        self.keypoint_extractor.report_model_timings([result for result in results if not result['skipped']])
+        if self.args.keypoint_store:
+            self.keypoint_extractor.pack_keypoint_store()
+        logging.info('Fused Process Completed')
@@ -1,100 +1,224 @@
 import os
-import glob
+import csv
+import time
 import logging
+import argparse
 from multiprocessing import Pool
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import cv2
 import mediapipe as mp
 import numpy as np
 from tqdm import tqdm
 
+from .keypoint_store import KeypointStoreWriter, count_keypoint_frames
+from .manifest import BuildManifest
 from .processor import Processor
+from .telemetry import get_worker_stats, timed, timed_iter
+
+NUM_BODY_KEYPOINTS = 33 # Body keypoints in the MediaPipe Holistic module
+NUM_HAND_KEYPOINTS = 21 # Hand keypoints in the MediaPipe Holistic module
+
+# MediaPipe Holistic model of the current worker process, built once and reused for every video
+_holistic_model: Optional[Any] = None
+_holistic_init_time: float = 0.0 # Initialization time not yet reported by a video
+_holistic_used: bool = False
 
 class KeypointExtractor(Processor):
-    def __init__(self) -> None:
-        super().__init__()
+    MANIFEST_STAGE = 'keypoint'
+    MANIFEST_PARAMS = ['model_complexity', 'keypoint_format', 'keypoint_dtype'] # Arguments that change the saved keypoints
+
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
+        
+    def extract_keypoints(self, video_name: str) -> Dict[str, Any]:
+        result = self._run_profiled(self.MANIFEST_STAGE, video_name, self._extract_video_keypoints, video_name)
+        return {**result, **get_worker_stats()}
+
+    def _extract_video_keypoints(self, video_name: str) -> Dict[str, Any]:
+        timings: Dict[str, float] = {}
+        frames = timed_iter(self._load_frames(video_name), timings, 'imread_time') # With prefetching, only the time MediaPipe waits for frames
+        keypoints = self.infer_keypoints(frames, timings=timings)
+        with timed(timings, 'save_time'):
+            keypoint_path = self.save_keypoints(video_name, keypoints)
+        outputs = {'files': {keypoint_path: BuildManifest.fingerprint(keypoint_path)}}
+        return {'video': video_name, 'frames': len(keypoints[2]), **timings, 'bytes_written': os.path.getsize(keypoint_path), 'outputs': outputs}
+
+    def get_frame_path(self, video_name: str) -> str:
+        return self.frame_store.get_path(self.video_root, video_name)
+
+    def _load_frames(self, video_name: str) -> Iterator[Optional[np.ndarray]]:
+        return self.frame_store.read_frames(self.get_frame_path(video_name), self.args.io_threads, self.args.prefetch_frames)
+
+    def init_worker(self) -> None:
+        global _holistic_model, _holistic_init_time, _holistic_used
+        if _holistic_model is not None:
+            return
+        start = time.perf_counter()
+        _holistic_model = mp.solutions.holistic.Holistic(static_image_mode=False, 
+                                                         model_complexity=self.args.model_complexity,
+                                                         min_detection_confidence=0.5, 
+                                                         min_tracking_confidence=0.5)
+        _holistic_init_time += time.perf_counter() - start
+        _holistic_used = False
+
+    def _get_holistic_model(self, timings: Dict[str, float]) -> Any:
+        global _holistic_init_time, _holistic_used
+        self.init_worker()
+        if _holistic_used:
+            _holistic_model.reset() # Drop the tracking state of the previous video
+        _holistic_used = True
+        timings['model_init_time'] = _holistic_init_time # Only the first video of a worker pays for initialization
+        _holistic_init_time = 0.0
+        return _holistic_model
+
+    def infer_keypoints(self, frames: Iterable[Optional[np.ndarray]], num_frames: int = 0, 
+                         timings: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._convert_results(self._run_holistic(frames, {} if timings is None else timings), num_frames)
+
+    def _run_holistic(self, frames: Iterable[Optional[np.ndarray]], timings: Dict[str, float]) -> Iterator[Tuple[Any, Optional[Tuple[int, int, int]]]]:
+        holistic_model = self._get_holistic_model(timings)
+        timings['inference_time'] = 0.0
+        for image in frames:
+            if image is None:
+                yield None, None
+                continue
+            start = time.perf_counter()
+            results = holistic_model.process(image)
+            timings['inference_time'] += time.perf_counter() - start
+            yield results, image.shape
+
+    def _convert_results(self, frame_results: Iterable[Tuple[Any, Optional[Tuple[int, int, int]]]], num_frames: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        capacity = max(num_frames, 1)
+        num_frames = 0
         
-    def _extract_keypoints(self, video_name: str) -> None:
-        frame_paths = self._read_video_frames(video_name)
-        num_frames: int = len(frame_paths)
+        left_hand_keypoints: np.ndarray = np.zeros((capacity, NUM_HAND_KEYPOINTS, 3)) # Create an empty keypoint numpy array
+        right_hand_keypoints: np.ndarray = np.zeros((capacity, NUM_HAND_KEYPOINTS, 3))
+        body_keypoints: np.ndarray = np.zeros((capacity, NUM_BODY_KEYPOINTS, 3))
+        image_sizes: np.ndarray = np.zeros((capacity, 1, 2)) # (width, height) of each frame
+        body_found: np.ndarray = np.zeros(capacity, dtype=bool)
         
-        mp_holistic = mp.solutions.holistic
-        with mp_holistic.Holistic(static_image_mode=False, 
-                                  model_complexity=2,
-                                  min_detection_confidence=0.5, 
-                                  min_tracking_confidence=0.5) as holistic_model:
-            left_hand_keypoints: np.ndarray = np.zeros((1, num_frames, 33, 3)) # Create an empty keypoint numpy array
-            right_hand_keypoints: np.ndarray = np.zeros((1, num_frames, 33, 3))
-            body_keypoints: np.ndarray = np.zeros((1, num_frames, 33, 3))
-            
-            for time_step, frame_path in enumerate(frame_paths):
-                image: Optional[np.ndarray] = self._process_frame(frame_path)
-                if image is None:
-                    continue
-
-                results = holistic_model.process(image)
-                self._update_keypoints(results, left_hand_keypoints, right_hand_keypoints, body_keypoints, image.shape, time_step)
-            
-            keypoints_concat: np.ndarray = np.concatenate([left_hand_keypoints, right_hand_keypoints, body_keypoints], axis=0)
-            keypoints_transposed: np.ndarray = np.transpose(keypoints_concat, (3, 1, 2, 0))
-            
-            np.save(f'{self.npy_path}/{video_name}.npy', keypoints_transposed)
-
-    def _update_keypoints(self, results: Any, left_hand_keypoints: np.ndarray, right_hand_keypoints: np.ndarray, 
-                          body_keypoints: np.ndarray, image_size: Tuple[int, int, int], time_step: int) -> None:
-        image_height, image_width, _ = image_size
-        for i in range(33): # 33 is body keypoints in the MediaPipe Holistic module
-            self._update_body_keypoints(i, results, body_keypoints, image_width, image_height, time_step)
-            if i <= 20: # 21 is hand keypoints in the MediaPipe Holistic module
-                self._update_hand_keypoints(i, results, right_hand_keypoints, left_hand_keypoints, image_width, image_height, time_step)
-
-    def _update_body_keypoints(self, i: int, results: Any, body_keypoints: np.ndarray, 
-                               image_width: int, image_height: int, time_step: int) -> None:
-        try:
-            pose_keypoint = results.pose_landmarks.landmark[i]
-            body_keypoints[:, time_step, i, :] = np.array([
-                pose_keypoint.x * image_width,
-                pose_keypoint.y * image_height,
-                pose_keypoint.visibility # Confidence of body kepoints
-            ])
-        except:
-            if time_step > 0:
-                body_keypoints[:, time_step, i, :] = body_keypoints[:, time_step - 1, i, :] # Use keypoint from neighboring frames if no keypoints are detected
-
-    def _update_hand_keypoints(self, i: int, results: Any, right_hand_keypoints: np.ndarray, 
-                               left_hand_keypoints: np.ndarray, image_width: int, image_height: int, time_step: int) -> None:
-        self._update_specific_hand_keypoints(i, results.right_hand_landmarks, right_hand_keypoints, image_width, image_height, time_step)
-        self._update_specific_hand_keypoints(i, results.left_hand_landmarks, left_hand_keypoints, image_width, image_height, time_step)
-
-    def _update_specific_hand_keypoints(self, i: int, hand_landmarks: Any, hand_keypoints: np.ndarray, 
-                                        image_width: int, image_height: int, time_step: int) -> None:
-        if hand_landmarks:
-            try:
-                hand_landmark = hand_landmarks.landmark[i]
-                hand_keypoints[:, time_step, i, :] = np.array([
-                    hand_landmark.x * image_width,
-                    hand_landmark.y * image_height, 1 # Confidence of hand kepoints = 1 (No hand's visibility in this version)
-                ])
-            except:
-                if time_step > 0:
-                    hand_keypoints[:, time_step, i, :] = hand_keypoints[:, time_step - 1, i, :]
+        for time_step, (results, image_size) in enumerate(frame_results):
+            if time_step >= capacity: # Streamed frames have no known length, so grow the arrays on demand
+                left_hand_keypoints, right_hand_keypoints, body_keypoints, image_sizes, body_found = (
+                    np.concatenate([buffer, np.zeros_like(buffer)], axis=0)
+                    for buffer in (left_hand_keypoints, right_hand_keypoints, body_keypoints, image_sizes, body_found))
+                capacity *= 2
+            num_frames = time_step + 1
+            if results is None:
+                body_found[time_step] = True # An unreadable frame keeps zero keypoints, which later frames carry forward
+                continue
 
-    def process(self) -> None:
-        logging.info('Keypoint extraction in progress...')
+            image_height, image_width, _ = image_size
+            image_sizes[time_step] = image_width, image_height
+            body_found[time_step] = self._landmarks_to_array(results.pose_landmarks, body_keypoints[time_step], use_visibility=True)
+            self._landmarks_to_array(results.left_hand_landmarks, left_hand_keypoints[time_step], use_visibility=False)
+            self._landmarks_to_array(results.right_hand_landmarks, right_hand_keypoints[time_step], use_visibility=False)
+        
+        keypoints = [left_hand_keypoints[:num_frames], right_hand_keypoints[:num_frames], body_keypoints[:num_frames]]
+        for part_keypoints in keypoints:
+            part_keypoints[..., :2] *= image_sizes[:num_frames] # Normalized coordinates to pixels
+        keypoints[2] = self._carry_forward(keypoints[2], body_found[:num_frames]) # Use keypoint from neighboring frames if no keypoints are detected
+        return tuple(keypoints) # (left hand, right hand, body)
+
+    def _landmarks_to_array(self, landmarks: Any, keypoints: np.ndarray, use_visibility: bool) -> bool:
+        if not landmarks:
+            return False
+        keypoints[:] = [(landmark.x, landmark.y, landmark.visibility if use_visibility else 1) # Confidence of hand keypoints = 1 (No hand's visibility in this version)
+                        for landmark in landmarks.landmark]
+        return True
+
+    def _carry_forward(self, keypoints: np.ndarray, found: np.ndarray) -> np.ndarray:
+        source_steps = np.where(found, np.arange(len(found)), -1)
+        np.maximum.accumulate(source_steps, out=source_steps) # Latest detected frame at or before each frame
+        filled = keypoints[np.maximum(source_steps, 0)]
+        filled[source_steps < 0] = 0
+        return filled
+
+    def _to_legacy_layout(self, left_hand_keypoints: np.ndarray, right_hand_keypoints: np.ndarray, body_keypoints: np.ndarray) -> np.ndarray:
+        keypoints_concat: np.ndarray = np.zeros((3, len(body_keypoints), NUM_BODY_KEYPOINTS, 3))
+        for part, part_keypoints in enumerate((left_hand_keypoints, right_hand_keypoints, body_keypoints)):
+            keypoints_concat[part, :, :part_keypoints.shape[1]] = part_keypoints # Hands are padded to 33 keypoints
+        return np.transpose(keypoints_concat, (3, 1, 2, 0))
+
+    def _to_compact_layout(self, left_hand_keypoints: np.ndarray, right_hand_keypoints: np.ndarray, body_keypoints: np.ndarray) -> np.ndarray:
+        return np.concatenate([left_hand_keypoints, right_hand_keypoints, body_keypoints], axis=1).astype(self.args.keypoint_dtype) # (frame, 21 + 21 + 33, 3)
+
+    def _load_compact_keypoints(self, keypoint_path: str) -> np.ndarray:
+        keypoints = np.load(keypoint_path, mmap_mode='r')
+        if keypoints.ndim == 3: # Already (frame, 75, 3)
+            return keypoints
+        return np.concatenate([np.transpose(keypoints[:, :, :num_keypoints, part], (1, 2, 0)) # (3, frame, 33, 3) legacy layout
+                               for part, num_keypoints in enumerate((NUM_HAND_KEYPOINTS, NUM_HAND_KEYPOINTS, NUM_BODY_KEYPOINTS))], axis=1)
+
+    def save_keypoints(self, video_name: str, keypoints: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> str:
+        if self.args.keypoint_format == 'compact':
+            keypoints_array = self._to_compact_layout(*keypoints)
+        else:
+            keypoints_array = self._to_legacy_layout(*keypoints)
+        keypoint_path = f'{self.npy_path}/{video_name}.npy'
+        with open(f'{keypoint_path}.tmp', 'wb') as file: # np.save would append .npy to the tmp path
+            np.save(file, keypoints_array)
+        os.replace(f'{keypoint_path}.tmp', keypoint_path) # An interrupted run leaves no truncated file behind the manifest's fingerprint
+        return keypoint_path
+
+    def pack_keypoint_store(self) -> None:
+        video_names = sorted(self.get_filename_without_extension(name) for name in os.listdir(self.npy_path) if name.endswith('.npy'))
+        logging.info(f'Packing {len(video_names)} keypoint files into {self.store_path}...')
+        writer = KeypointStoreWriter(self.store_path, self.args.keypoint_dtype, self.args.store_shard_size)
+        videos = [(name, count_keypoint_frames(os.path.join(self.npy_path, f'{name}.npy'))) for name in video_names]
+        writer.write(videos, lambda name: self._load_compact_keypoints(os.path.join(self.npy_path, f'{name}.npy')))
+
+    def report_model_timings(self, timings: List[Dict[str, Any]]) -> None:
+        if not timings:
+            return
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        timing_path = os.path.join(self.args.save_path, mode_folder, 'keypoint_timing.csv')
+        with open(timing_path, 'w', encoding='utf-8', newline='') as timing_file:
+            writer = csv.DictWriter(timing_file, fieldnames=['video', 'frames', 'model_init_time', 'inference_time'], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(timings)
+
+        init_times = [row['model_init_time'] for row in timings if row['model_init_time'] > 0]
+        mean_init_time = sum(init_times) / max(len(init_times), 1)
+        inference_time = sum(row['inference_time'] for row in timings)
+        logging.info(f'Model initialization: {sum(init_times):.1f}s over {len(init_times)} workers ({mean_init_time:.2f}s each), '
+                     f'inference: {inference_time:.1f}s over {len(timings)} videos')
+        logging.info(f'Building the model per video would have added ~{mean_init_time * (len(timings) - len(init_times)):.1f}s. '
+                     f'Per video timings are saved in {timing_path}')
+
+    def set_paths(self) -> None:
         _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
         
         self.video_root: str = os.path.join(self.args.save_path, mode_folder, 'Video')
         self.npy_path: str = os.path.join(self.args.save_path, mode_folder, 'Keypoint')
+        self.store_path: str = os.path.join(self.args.save_path, mode_folder, 'KeypointStore')
+
+    def process(self) -> None:
+        logging.info('Keypoint extraction in progress...')
+        self.set_paths()
 
-        video_names = os.listdir(self.video_root)
+        video_frames = self.frame_store.list_videos(self.video_root)
+        video_names = self._longest_first(sorted(video_frames), video_frames.get)
         logging.info(f'Num of Video: {len(video_names)}')
 
-        existing_npys = os.listdir(self.npy_path)
-        existing_npys = [npy.split('.')[0] for npy in existing_npys]
+        manifest = self.load_manifest()
+        params = self.get_manifest_params(self.MANIFEST_PARAMS)
+        inputs = {video_name: {'frames': BuildManifest.fingerprint(self.get_frame_path(video_name))} for video_name in video_names}
+        video_names_to_process = [video_name for video_name in video_names # Do not run completed data 
+                                  if not manifest.is_up_to_date(self.MANIFEST_STAGE, video_name, inputs[video_name], params)]
+        logging.info(f'{len(video_names) - len(video_names_to_process)} of {len(video_names)} videos are up to date in {manifest.manifest_path}')
         
-        video_names_to_process = list(set(video_names) - set(existing_npys)) # Do not run completed data 
-        
-        with Pool(processes=self.args.mp) as pool:
-            list(tqdm(pool.imap(self._extract_keypoints, video_names_to_process), total=len(video_names_to_process)))
+        timings = []
+        start = time.perf_counter()
+        try:
+            with Pool(processes=self.args.mp, initializer=self.init_worker) as pool:
+                for result in tqdm(pool.imap(self.extract_keypoints, video_names_to_process, chunksize=self.args.chunksize), total=len(video_names_to_process)):
+                    manifest.record(self.MANIFEST_STAGE, result['video'], inputs[result['video']], params, result['outputs'])
+                    timings.append(result)
+        finally:
+            manifest.save() # Videos finished before a failing one are not redone on the next run
+        self.report_model_timings(timings)
+        self.save_stage_report(self.MANIFEST_STAGE, timings, time.perf_counter() - start)
+        if self.args.keypoint_store:
+            self.pack_keypoint_store()
         logging.info('Keypoint Extraction Completed')
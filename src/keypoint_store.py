@@ -0,0 +1,97 @@
+import os
+import json
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+KEYPOINT_PARTS = {'left_hand': (0, 21), 'right_hand': (21, 42), 'body': (42, 75)} # Keypoint ranges of each part in the compact layout
+INDEX_FILENAME = 'index.json'
+
+def read_npy_shape(npy_path: str) -> Tuple[int, ...]:
+    with open(npy_path, 'rb') as npy_file: # Only the header, the array is not read
+        version = np.lib.format.read_magic(npy_file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, _ = read_header(npy_file)
+    return shape
+
+def count_keypoint_frames(keypoint_path: str) -> int:
+    shape = read_npy_shape(keypoint_path)
+    return shape[1] if len(shape) == 4 else shape[0] # (3, frame, 33, 3) legacy or (frame, 75, 3) compact layout
+
+class KeypointStoreWriter:
+    def __init__(self, store_path: str, dtype: str = 'float32', shard_size: int = 1000) -> None:
+        self.store_path = store_path
+        self.dtype = dtype
+        self.shard_size = shard_size
+
+    def _shard_filename(self, shard: int) -> str:
+        return f'keypoints_{shard:05}.npy'
+
+    def write(self, videos: List[Tuple[str, int]], load_keypoints: Callable[[str], np.ndarray]) -> None:
+        """
+        Packs videos, given as (video_id, number of frames) pairs, into shards of `shard_size` videos.
+        Shards are sized from the frame counts, so `load_keypoints(video_id)` is called for one video at a time
+        and only that video's (frame, 75, 3) keypoints are held or mapped while it is copied.
+        """
+        os.makedirs(self.store_path, exist_ok=True)
+        shards: List[str] = []
+        index_videos: Dict[str, List[int]] = {}
+
+        for shard, shard_start in enumerate(range(0, len(videos), self.shard_size)):
+            shard_videos = videos[shard_start:shard_start + self.shard_size]
+            shard_filename = self._shard_filename(shard)
+            shard_array = np.lib.format.open_memmap(os.path.join(self.store_path, shard_filename), mode='w+', dtype=self.dtype,
+                                                    shape=(sum(num_frames for _, num_frames in shard_videos), 75, 3))
+            offset = 0
+            for video_id, num_frames in shard_videos:
+                video_keypoints = load_keypoints(video_id)
+                if len(video_keypoints) != num_frames:
+                    raise ValueError(f'{video_id} has {len(video_keypoints)} frames, its header promised {num_frames}')
+                shard_array[offset:offset + num_frames] = video_keypoints
+                del video_keypoints # Unmapped before the next video is opened
+                index_videos[video_id] = [shard, offset, num_frames]
+                offset += num_frames
+            shard_array.flush()
+            del shard_array
+            shards.append(shard_filename)
+
+        index = {'dtype': self.dtype, 'parts': KEYPOINT_PARTS, 'shards': shards, 'videos': index_videos}
+        index_path = os.path.join(self.store_path, INDEX_FILENAME)
+        with open(f'{index_path}.tmp', 'w', encoding='utf-8') as index_file:
+            json.dump(index, index_file, ensure_ascii=False)
+        os.replace(f'{index_path}.tmp', index_path) # Written last, a store whose shards are still being packed has no index to open
+
+class KeypointStore:
+    """
+    Read-only view of a keypoint store. Shards are memory-mapped, so indexing a video only reads its frames.
+
+        store = KeypointStore('./result/Train/KeypointStore')
+        keypoints = store['NIA_SL_...']            # (frame, 75, 3)
+        left_hand = store.get_part('NIA_SL_...', 'left_hand')  # (frame, 21, 3)
+    """
+    def __init__(self, store_path: str) -> None:
+        with open(os.path.join(store_path, INDEX_FILENAME), 'r', encoding='utf-8') as index_file:
+            index = json.load(index_file)
+        self.parts: Dict[str, List[int]] = index['parts']
+        self.shards = [np.load(os.path.join(store_path, shard), mmap_mode='r') for shard in index['shards']]
+        self.videos: Dict[str, List[int]] = index['videos']
+        self.video_ids: List[str] = list(self.videos)
+        self._entries: List[List[int]] = list(self.videos.values())
+
+    def __len__(self) -> int:
+        return len(self.video_ids)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.videos
+
+    def __getitem__(self, video_id: str) -> np.ndarray:
+        shard, offset, length = self.videos[video_id]
+        return self.shards[shard][offset:offset + length]
+
+    def get_by_index(self, index: int) -> np.ndarray:
+        shard, offset, length = self._entries[index] # Position in video_ids, e.g. from Tokens/keypoint_index.npy
+        return self.shards[shard][offset:offset + length]
+
+    def get_part(self, video_id: str, part: str) -> np.ndarray:
+        start, end = self.parts[part]
+        return self[video_id][:, start:end]
@@ -0,0 +1,62 @@
+import os
+import json
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError: # orjson is optional, the standard library parser is used without it
+    orjson = None
+
+COLUMNS = ['json_path', 'fingerprint', 'video_id', 'sign_window', 'pose_top', 'korean_text', 'gloss_sequence']
+
+def json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(data: Any) -> bytes:
+    return orjson.dumps(data) if orjson is not None else json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+class LabelCache:
+    """
+    Columnar cache of the label fields used by the video and language stages, keyed by JSON file name.
+    The large per-frame landmark arrays of the AIHub JSON files are not kept.
+    """
+    def __init__(self, cache_path: str) -> None:
+        self.cache_path = cache_path
+        self.names: List[str] = []
+        self.columns: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as cache_file:
+                cache = json_loads(cache_file.read())
+            self.names, self.columns = cache['names'], cache['columns']
+        self._rows = {name: row for row, name in enumerate(self.names)}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        row = self._rows[name]
+        return {column: values[row] for column, values in self.columns.items()}
+
+    def update(self, name: str, record: Dict[str, Any]) -> None:
+        if name not in self._rows:
+            self._rows[name] = len(self.names)
+            self.names.append(name)
+            for column in COLUMNS:
+                self.columns[column].append(None)
+        row = self._rows[name]
+        for column in COLUMNS:
+            self.columns[column][row] = record[column]
+
+    def retain(self, names: List[str]) -> None:
+        kept_rows = [self._rows[name] for name in names if name in self._rows] # Drop labels whose JSON file is gone
+        self.names = [self.names[row] for row in kept_rows]
+        self.columns = {column: [values[row] for row in kept_rows] for column, values in self.columns.items()}
+        self._rows = {name: row for row, name in enumerate(self.names)}
+
+    def save(self) -> None:
+        with open(f'{self.cache_path}.tmp', 'wb') as cache_file:
+            cache_file.write(json_dumps({'names': self.names, 'columns': self.columns}))
+        os.replace(f'{self.cache_path}.tmp', self.cache_path)
@@ -0,0 +1,74 @@
+import time
+import logging
+import argparse
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional
+
+from tqdm import tqdm
+
+from .label_cache import COLUMNS, json_loads, orjson
+from .manifest import BuildManifest
+from .processor import Processor
+from .telemetry import get_worker_stats
+
+class LabelProcessor(Processor):
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
+
+    def _get_sign_window(self, sign_script: Dict[str, Any]) -> Optional[List[float]]:
+        try:
+            total = sum(sign_script.values(), [])
+            return [min(i['start'] for i in total), max(i['end'] for i in total)]
+        except KeyError:
+            logging.error("JSON error")
+            return None
+
+    def _get_pose_top(self, pose_keypoints: List[List[float]]) -> float:
+        return min(keypoint[j] for keypoint in pose_keypoints for j in range(1, 75, 3)) # Highest y position of the signer
+
+    def _create_gloss_sequence(self, sign_data: Dict[str, Any]) -> str:
+        try:
+            sign_script = sign_data['sign_script']
+            gestures = sign_script['sign_gestures_both'] + sign_script['sign_gestures_strong'] + sign_script['sign_gestures_weak']
+            ordered_gestures = sorted(gestures, key=lambda gesture: gesture['start']) # Integrating Gloss in order by time
+            return " ".join(gesture['gloss_id'] for gesture in ordered_gestures)
+        except KeyError:
+            return ""
+
+    def _parse_json_file(self, json_path: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with open(json_path, 'rb') as json_file:
+            json_data = json_loads(json_file.read())
+        return {
+            'json_path': json_path,
+            'fingerprint': BuildManifest.fingerprint(json_path),
+            'video_id': json_data['metadata']['id'],
+            'sign_window': self._get_sign_window(json_data['sign_script']),
+            'pose_top': self._get_pose_top(json_data['landmarks']['pose_keypoints_2d']),
+            'korean_text': json_data['korean_text'],
+            'gloss_sequence': self._create_gloss_sequence(json_data),
+            'parse_time': time.perf_counter() - start, # Telemetry fields are not kept in the label cache
+            **get_worker_stats(),
+        }
+
+    def process(self) -> None:
+        logging.info(f'Label ingestion in progress ({"orjson" if orjson is not None else "json"} parser)...')
+        file_index = self._get_file_index()
+        json_paths = file_index.get_paths('json') # Keyed by file name without extension
+        json_file_mapping = {name: json_paths[name] for name in file_index.get_matching_ids()} # Labels without an mp4 are never used, nor read
+        label_cache = self.load_label_cache()
+        label_cache.retain(list(json_file_mapping))
+
+        stale_names = [name for name, json_path in json_file_mapping.items() # Parse only new or modified JSON files
+                       if name not in label_cache or label_cache.get(name)['fingerprint'] != BuildManifest.fingerprint(json_path)]
+        logging.info(f'Parsing {len(stale_names)} JSON files ({len(json_file_mapping) - len(stale_names)} reused from {label_cache.cache_path})...')
+        telemetry = []
+        start = time.perf_counter()
+        with mp.Pool(processes=self.args.mp) as pool:
+            records = pool.imap(self._parse_json_file, [json_file_mapping[name] for name in stale_names], chunksize=16)
+            for name, record in tqdm(zip(stale_names, records), total=len(stale_names)):
+                label_cache.update(name, record)
+                telemetry.append({'video': name, **{key: value for key, value in record.items() if key not in COLUMNS}})
+        label_cache.save()
+        self.save_stage_report('label', telemetry, time.perf_counter() - start)
+        logging.info('Label Ingestion Completed')
@@ -1,77 +1,76 @@
 import os
-import glob
-import json
+import time
 import logging
-import collections
-import multiprocessing as mp
-from typing import Any, Dict, List, Optional, Tuple
-
-from tqdm import tqdm
+import argparse
+from typing import Any, Dict, Iterable, Optional, Tuple
 
+from .fused_processor import FusedProcessor
+from .keypoint_store import count_keypoint_frames
+from .language_writer import LanguageWriter
 from .processor import Processor
+from .video_processor import VideoProcessor
 
 class LanguageProcessor(Processor):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
         
-    def _list_video_names_within_max_frame(self) -> List[str]:
-        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
-        videos_directory = os.path.join(self.args.save_path, mode_folder, 'Video')
-        video_folders = [name for name in os.listdir(videos_directory) if os.path.isdir(os.path.join(videos_directory, name))]
-        return [name for name in video_folders if len(os.listdir(os.path.join(videos_directory, name))) <= self.args.max_frame] # Select max frame or less from the entire video data
-    
-    def _create_gloss_sequence(self, sign_data: Dict[str, Any]) -> str:
-        try:
-            sign_script = sign_data['sign_script']
-            gestures = sign_script['sign_gestures_both'] + sign_script['sign_gestures_strong'] + sign_script['sign_gestures_weak']
-            ordered_gestures = sorted(gestures, key=lambda gesture: gesture['start']) # Integrating Gloss in order by time
-            return " ".join(gesture['gloss_id'] for gesture in ordered_gestures)
-        except KeyError:
-            return ""
+    def _get_upstream_frames(self) -> Dict[str, int]:
+        upstream_processor = FusedProcessor if self.args.fused else VideoProcessor
+        params = self.get_manifest_params(upstream_processor.MANIFEST_PARAMS)
+        entries = self.load_manifest().stages.get(upstream_processor.MANIFEST_STAGE, {})
+        return {name: entry['outputs']['frames'] for name, entry in entries.items() # Frame counts recorded by the video (or fused) stage
+                if entry['params'] == params and not entry['outputs'].get('skipped', False)}
 
-    def _process_json_file(self, json_file_path: str) -> Tuple[str, Dict[str, str]]:
-        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+    def _count_video_frames(self) -> Dict[str, int]:
+        video_frames = self._get_upstream_frames()
+        if video_frames:
+            return video_frames
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type) # Outputs without a manifest, count the frames on disk
+        if self.args.frame_writer == 'none': # Frames are not kept in fused mode, so the keypoint files list the videos
+            keypoints_directory = os.path.join(self.args.save_path, mode_folder, 'Keypoint')
+            with os.scandir(keypoints_directory) as entries:
+                return {self.get_filename_without_extension(entry.name): count_keypoint_frames(entry.path)
+                        for entry in entries if entry.name.endswith('.npy')}
+        return self.frame_store.list_videos(os.path.join(self.args.save_path, mode_folder, 'Video'))
 
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            json_content = json.load(file)
-        video_id = json_content['metadata']['id']
-        video_base_dir = os.path.join(self.args.save_path, mode_folder, 'Video', video_id)
+    def _list_video_names_within_max_frame(self) -> Dict[str, int]:
+        video_frames = self._count_video_frames()
+        return {name: frames for name, frames in video_frames.items() if frames <= self.args.max_frame} # Select max frame or less from the entire video data
+    
+    def create_data_row(self, label: Dict[str, Any], num_frames: int) -> Tuple[str, Dict[str, str]]:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        video_id = label['video_id']
+        video_path = self.frame_store.get_path(os.path.join(self.args.save_path, mode_folder, 'Video'), video_id) # A frame folder, npy or mp4 file
         return video_id, {
-            'video_path' : video_base_dir,
+            'video_path' : video_path,
             'keypoint_path' : os.path.join(self.args.save_path, mode_folder, 'Keypoint', f'{video_id}.npy'),                        
-            "korean_text": json_content['korean_text'],
-            "gloss_sequence": self._create_gloss_sequence(json_content),
-            "frame" : len(os.listdir(video_base_dir)),
+            "korean_text": label['korean_text'],
+            "gloss_sequence": label['gloss_sequence'],
+            "frame" : num_frames,
         }
 
-    def _make_vocabulary(self, processed_data: Dict[str, Dict[str, str]]) -> List[str]:
-        gloss_vocab = [data['gloss_sequence'].split() for video_id, data in processed_data.items()]
-        count_dict = collections.Counter([item for sublist in gloss_vocab for item in sublist])
-        return [gloss for gloss, _ in count_dict.most_common()]
-        
-    def _save_results(self, serialized_data: str, gloss_vocabulary: List[str]) -> None:
+    def open_writer(self) -> LanguageWriter:
         _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
-        json_save_path = os.path.join(self.args.save_path, mode_folder, 'Language', f'{mode_folder}.json')
-        with open(json_save_path, 'w', encoding='utf-8') as output_file:
-            output_file.write(serialized_data)
-        vocab_save_path = os.path.join(self.args.save_path, mode_folder, 'Language', f'{mode_folder}.vocab')
-        with open(vocab_save_path, 'w', encoding='utf-8') as file:
-            for gloss in gloss_vocabulary:
-                file.write(gloss + '\n')
-                
-    def process(self) -> None:
-        logging.info('Language preprocessing in progress...')
-        json_file_mapping = self._find_json_file_paths()
-        video_names = self._list_video_names_within_max_frame()
-        filtered_json_paths = [json_file_mapping.get(name) for name in video_names if name in json_file_mapping]
+        return LanguageWriter(os.path.join(self.args.save_path, mode_folder, 'Language'), mode_folder,
+                              self.args.language_format, self.args.language_shard_size)
 
-        with mp.Pool(processes=self.args.mp) as pool:
-            processed_data = list(tqdm(pool.imap(self._process_json_file, filtered_json_paths), total=len(filtered_json_paths)))
+    def close_writer(self, writer: LanguageWriter, wall_time: float) -> None:
+        bytes_written = writer.close()
+        self.save_stage_report('language', [], wall_time, videos=writer.num_rows, 
+                                times={'write_time': round(writer.write_time, 3)}, bytes_written=bytes_written)
 
-        final_result = {video_id: data_row for video_id, data_row in processed_data}
-        gloss_vocabulary = self._make_vocabulary(final_result)
-        serialized_data = json.dumps(final_result, indent=4, ensure_ascii=False)
+    def _write_outputs(self, processed_data: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        start = time.perf_counter()
+        writer = self.open_writer()
+        for video_id, data_row in processed_data: # Rows are written as they are created, the split is never held in memory
+            writer.write(video_id, data_row)
+        self.close_writer(writer, time.perf_counter() - start)
 
-        self._save_results(serialized_data, gloss_vocabulary)
+    def process(self) -> None:
+        logging.info('Language preprocessing in progress...')
+        label_cache = self.load_label_cache() # Parsed once by the label ingestion stage
+        video_frames = self._list_video_names_within_max_frame()
+        self._write_outputs(self.create_data_row(label_cache.get(name), video_frames[name]) 
+                            for name in sorted(video_frames) if name in label_cache)
         logging.info('Language Process Completed')
 
@@ -0,0 +1,109 @@
+import os
+import glob
+import json
+import time
+import collections
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .label_cache import json_dumps, json_loads
+
+class LanguageWriter:
+    """
+    Streams the rows of a split to disk as they arrive, either as a `<split>.json` object laid out like
+    `json.dumps(indent=4)` or as `<split>.jsonl` JSON Lines, and counts the glosses on the way for the vocabulary.
+    With a `shard_size`, every `shard_size` rows go to their own `<split>-00000.json(l)` file.
+    Files are written under a temporary name and renamed on `close`, so readers never see a partial split.
+    """
+    def __init__(self, language_path: str, split: str, language_format: str, shard_size: int = 0) -> None:
+        self.language_path = language_path
+        self.split = split
+        self.extension = language_format
+        self.shard_size = shard_size
+        self.gloss_counts: collections.Counter = collections.Counter()
+        self.num_rows = 0
+        self.write_time = 0.0
+        self.output_paths: List[str] = []
+        self._file: Optional[Any] = None
+        self._rows_in_file = 0
+
+    def _get_path(self) -> str:
+        if self.shard_size > 0:
+            return os.path.join(self.language_path, f'{self.split}-{len(self.output_paths):05}.{self.extension}')
+        return os.path.join(self.language_path, f'{self.split}.{self.extension}')
+
+    def _open_file(self) -> None:
+        self.output_paths.append(self._get_path())
+        self._file = open(f'{self.output_paths[-1]}.tmp', 'wb')
+        self._rows_in_file = 0
+        if self.extension == 'json':
+            self._file.write(b'{')
+
+    def _close_file(self) -> None:
+        if self.extension == 'json':
+            self._file.write(b'\n}' if self._rows_in_file else b'}') # Same bytes as json.dumps(indent=4), including an empty split
+        self._file.close()
+        self._file = None
+
+    def write(self, video_id: str, row: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        if self._file is not None and self.shard_size > 0 and self._rows_in_file >= self.shard_size:
+            self._close_file()
+        if self._file is None:
+            self._open_file()
+        if self.extension == 'json':
+            entry = json.dumps({video_id: row}, indent=4, ensure_ascii=False)[1:-2] # "\n    "<id>": {...}" without the outer braces
+            self._file.write((',' if self._rows_in_file else '').encode('utf-8') + entry.encode('utf-8'))
+        else:
+            self._file.write(json_dumps({'video_id': video_id, **row}) + b'\n')
+        self.gloss_counts.update(row['gloss_sequence'].split())
+        self._rows_in_file += 1
+        self.num_rows += 1
+        self.write_time += time.perf_counter() - start
+
+    def _remove_stale_files(self) -> None:
+        stale_paths = glob.glob(os.path.join(self.language_path, f'{self.split}-[0-9][0-9][0-9][0-9][0-9].{self.extension}'))
+        stale_paths.append(os.path.join(self.language_path, f'{self.split}.{self.extension}'))
+        for path in stale_paths:
+            if path not in self.output_paths and os.path.exists(path): # Shards of a previous, larger or differently sharded run
+                os.remove(path)
+
+    def close(self) -> int:
+        """
+        Finishes the split and writes the vocabulary, returns the number of bytes written.
+        """
+        start = time.perf_counter()
+        if self._file is None and not self.output_paths: # No rows, still write an empty split
+            self._open_file()
+        if self._file is not None:
+            self._close_file()
+        for path in self.output_paths:
+            os.replace(f'{path}.tmp', path)
+        self._remove_stale_files()
+
+        vocab_path = os.path.join(self.language_path, f'{self.split}.vocab')
+        counts_path = os.path.join(self.language_path, f'{self.split}.vocab.tsv')
+        gloss_counts = self.gloss_counts.most_common() # Most frequent first, ties in order of first appearance
+        with open(vocab_path, 'w', encoding='utf-8') as vocab_file:
+            for gloss, _ in gloss_counts:
+                vocab_file.write(gloss + '\n')
+        with open(counts_path, 'w', encoding='utf-8') as counts_file:
+            for gloss, count in gloss_counts:
+                counts_file.write(f'{gloss}\t{count}\n')
+        self.write_time += time.perf_counter() - start
+        return sum(os.path.getsize(path) for path in self.output_paths + [vocab_path, counts_path])
+
+def read_language_rows(language_path: str, split: str, language_format: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yields the (video_id, row) pairs written by LanguageWriter, in the order they were written.
+    """
+    paths = sorted(glob.glob(os.path.join(language_path, f'{split}-[0-9][0-9][0-9][0-9][0-9].{language_format}')))
+    if not paths:
+        paths = [os.path.join(language_path, f'{split}.{language_format}')]
+    for path in paths:
+        with open(path, 'rb') as language_file:
+            if language_format == 'json':
+                yield from json_loads(language_file.read()).items()
+                continue
+            for line in language_file:
+                row = json_loads(line)
+                yield row.pop('video_id'), row
@@ -0,0 +1,48 @@
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+SAVE_INTERVAL = 200 # Records between intermediate saves, so a crashed run keeps most of its progress
+
+class BuildManifest:
+    """
+    Records, per stage and video, the input fingerprints, the parameters and the outputs of the last successful run.
+    A video is redone only when one of them changed or its outputs are gone.
+    """
+    def __init__(self, manifest_path: str) -> None:
+        self.manifest_path = manifest_path
+        self.stages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._unsaved = 0
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                self.stages = json.load(manifest_file)
+
+    @staticmethod
+    def fingerprint(path: str) -> Optional[List[int]]:
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if os.path.isdir(path): # Entry count and directory mtime change whenever a frame is added or removed
+            return [len(os.listdir(path)), stat.st_mtime_ns]
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        return self.stages.get(stage, {}).get(key)
+
+    def is_up_to_date(self, stage: str, key: str, inputs: Dict[str, Any], params: Dict[str, Any]) -> bool:
+        entry = self.get(stage, key)
+        if entry is None or entry['inputs'] != inputs or entry['params'] != params:
+            return False
+        return all(self.fingerprint(path) == fingerprint for path, fingerprint in entry['outputs'].get('files', {}).items())
+
+    def record(self, stage: str, key: str, inputs: Dict[str, Any], params: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        self.stages.setdefault(stage, {})[key] = {'inputs': inputs, 'params': params, 'outputs': outputs}
+        self._unsaved += 1
+        if self._unsaved >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self) -> None:
+        with open(f'{self.manifest_path}.tmp', 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.stages, manifest_file, ensure_ascii=False)
+        os.replace(f'{self.manifest_path}.tmp', self.manifest_path) # A crash never leaves a truncated manifest
+        self._unsaved = 0
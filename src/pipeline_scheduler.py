@@ -0,0 +1,227 @@
+import time
+import queue
+import logging
+import traceback
+import multiprocessing as mp
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from .fused_processor import FusedProcessor
+from .keypoint_extractor import KeypointExtractor
+from .label_processor import LabelProcessor
+from .language_processor import LanguageProcessor
+from .manifest import BuildManifest
+from .video_processor import VideoProcessor
+
+STAGES = ['probe', 'decode', 'keypoint']
+PROBE_WORKERS = 1 # Default number of probe processes
+WORKER_CHECK_INTERVAL = 10 # Seconds without results before checking that the workers are alive
+
+def _run_stage_worker(stage: str, function: Callable[[Any], Any], initializer: Callable[[], None],
+                      task_queue: mp.Queue, result_queue: mp.Queue) -> None:
+    initializer()
+    for task in iter(task_queue.get, None): # None tells the worker to exit
+        try:
+            result_queue.put((stage, function(task), None))
+        except Exception:
+            result_queue.put((stage, None, traceback.format_exc()))
+
+class PipelineScheduler:
+    """
+    Streams each video through probe -> decode/crop -> keypoints -> label row as soon as the previous stage is done,
+    instead of running each stage over the whole split. Every stage has its own worker processes and a bounded queue,
+    and a stage is not fed while the backlog of the next stage is full, so the work in flight stays bounded.
+    """
+    def __init__(self, label_processor: LabelProcessor, video_processor: VideoProcessor, keypoint_extractor: KeypointExtractor,
+                 language_processor: LanguageProcessor, fused_processor: FusedProcessor) -> None:
+        self.args = video_processor.args
+        self.label_processor = label_processor
+        self.video_processor = video_processor
+        self.keypoint_extractor = keypoint_extractor
+        self.language_processor = language_processor
+        self.decode_processor = fused_processor if self.args.fused else video_processor # Fused mode extracts keypoints while decoding
+
+    def _get_num_workers(self, stage: str) -> int:
+        num_workers = getattr(self.args, f'{stage}_workers')
+        if num_workers is not None:
+            return num_workers
+        if stage == 'probe': # Probing only reads the container headers
+            return PROBE_WORKERS
+        if self.args.fused: # Decode workers also run MediaPipe, no keypoint stage
+            return max(self.args.mp - PROBE_WORKERS, 1)
+        decode_workers = max((self.args.mp - PROBE_WORKERS) // 2, 1) # --mp is split between the stages, so a default run stays within --mp processes
+        return decode_workers if stage == 'decode' else max(self.args.mp - PROBE_WORKERS - decode_workers, 1)
+
+    def _start_workers(self) -> None:
+        stage_functions = {
+            'probe': (self.video_processor.probe_video, self.video_processor.init_worker),
+            'decode': (self.decode_processor.process_video, self.decode_processor.init_worker),
+            'keypoint': (self.keypoint_extractor.extract_keypoints, self.keypoint_extractor.init_worker),
+        }
+        self.result_queue: mp.Queue = mp.Queue()
+        self.task_queues: Dict[str, mp.Queue] = {}
+        self.workers: Dict[str, List[mp.Process]] = {}
+        for stage in STAGES:
+            if stage == 'keypoint' and self.args.fused:
+                continue
+            function, initializer = stage_functions[stage]
+            self.task_queues[stage] = mp.Queue(maxsize=self._get_num_workers(stage) + self.args.queue_size)
+            self.workers[stage] = [mp.Process(target=_run_stage_worker, args=(stage, function, initializer, self.task_queues[stage], self.result_queue), daemon=True)
+                                   for _ in range(self._get_num_workers(stage))]
+            for worker in self.workers[stage]:
+                worker.start()
+
+    def _stop_workers(self, terminate: bool = False) -> None:
+        for stage, workers in self.workers.items():
+            for worker in workers:
+                if terminate:
+                    worker.terminate()
+                else:
+                    self.task_queues[stage].put(None)
+            for worker in workers:
+                worker.join()
+
+    def _dispatch(self) -> None:
+        for index, stage in reversed(list(enumerate(STAGES))): # Feed downstream stages first so finished work drains
+            next_stage = STAGES[index + 1] if index + 1 < len(STAGES) else None
+            capacity = self._get_num_workers(stage) + self.args.queue_size
+            while self.ready[stage] and self.in_flight[stage] < capacity:
+                if next_stage is not None and len(self.ready[next_stage]) >= self.args.queue_size: # Backpressure from the next stage
+                    break
+                self.task_queues[stage].put(self.ready[stage].popleft())
+                self.in_flight[stage] += 1
+
+    def _get_result(self) -> Tuple[str, Any, Optional[str]]:
+        while True:
+            try:
+                return self.result_queue.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                for stage, workers in self.workers.items():
+                    if any(not worker.is_alive() for worker in workers): # e.g. a crashed initializer, its tasks would never finish
+                        raise RuntimeError(f'A {stage} worker exited unexpectedly')
+
+    def _finish_video(self, name: str, num_frames: Optional[int] = None) -> None:
+        row = None
+        if num_frames is not None and num_frames <= self.args.max_frame: # Select max frame or less from the entire video data
+            row = self.language_processor.create_data_row(self.label_cache.get(name), num_frames)
+        self.finished_rows[name] = row
+        while self.next_video < len(self.video_names) and self.video_names[self.next_video] in self.finished_rows: # Stream rows in video id order
+            row = self.finished_rows.pop(self.video_names[self.next_video])
+            if row is not None:
+                self.language_writer.write(*row)
+            self.next_video += 1
+        self.progress.update(1)
+
+    def _on_probed(self, result: Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]) -> None:
+        video_path, video_metadata, telemetry = result
+        self.metadata_index.set(video_path, video_metadata) # Saved with the manifest when the run ends
+        if telemetry is not None:
+            self.probe_results.append(telemetry)
+        name = self.video_processor.get_filename_without_extension(video_path)
+        if not self.video_processor.is_fps_in_range(video_metadata):
+            self._finish_video(name)
+            return
+
+        label = self.label_cache.get(name)
+        self.video_inputs[name] = {'json': label['fingerprint'], 'mp4': BuildManifest.fingerprint(video_path)}
+        stage = self.decode_processor.MANIFEST_STAGE
+        if self.manifest.is_up_to_date(stage, name, self.video_inputs[name], self.decode_params):
+            outputs = self.manifest.get(stage, name)['outputs']
+            self._on_decoded({'video': name, 'skipped': outputs.get('skipped', False), 'outputs': outputs}, cached=True)
+        else:
+            self.ready['decode'].append((label, video_path, video_metadata))
+
+    def _on_decoded(self, result: Dict[str, Any], cached: bool = False) -> None:
+        name = result['video']
+        if not cached:
+            self.manifest.record(self.decode_processor.MANIFEST_STAGE, name, self.video_inputs[name], self.decode_params, result['outputs'])
+            self.decode_results.append(result)
+        if result['skipped']:
+            self._finish_video(name)
+            return
+
+        self.frames[name] = result['outputs']['frames']
+        if self.args.fused:
+            self._finish_video(name, self.frames[name])
+            return
+
+        self.keypoint_inputs[name] = {'frames': BuildManifest.fingerprint(self.keypoint_extractor.get_frame_path(name))}
+        if self.manifest.is_up_to_date(self.keypoint_extractor.MANIFEST_STAGE, name, self.keypoint_inputs[name], self.keypoint_params):
+            self._finish_video(name, self.frames[name])
+        else:
+            self.ready['keypoint'].append(name)
+
+    def _on_keypoints(self, result: Dict[str, Any]) -> None:
+        name = result['video']
+        self.manifest.record(self.keypoint_extractor.MANIFEST_STAGE, name, self.keypoint_inputs[name], self.keypoint_params, result['outputs'])
+        self.keypoint_results.append(result)
+        self._finish_video(name, self.frames[name])
+
+    def run(self) -> None:
+        logging.info('Pipelined preprocessing in progress...')
+        self.label_processor.process()
+        self.keypoint_extractor.set_paths()
+        if self.args.fused:
+            self.decode_processor.keypoint_extractor.set_paths()
+        self.label_cache = self.video_processor.load_label_cache()
+        self.manifest = self.video_processor.load_manifest()
+        self.metadata_index = self.video_processor.open_video_metadata()
+        self.decode_params = self.decode_processor.get_manifest_params(self.decode_processor.MANIFEST_PARAMS)
+        self.keypoint_params = self.keypoint_extractor.get_manifest_params(self.keypoint_extractor.MANIFEST_PARAMS)
+
+        _, video_paths = self.video_processor.find_matching_files()
+        self.ready: Dict[str, deque] = {stage: deque() for stage in STAGES}
+        self.in_flight: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.video_inputs: Dict[str, Dict[str, Any]] = {}
+        self.keypoint_inputs: Dict[str, Dict[str, Any]] = {}
+        self.frames: Dict[str, int] = {}
+        self.video_names = [self.video_processor.get_filename_without_extension(video_path) for video_path in video_paths]
+        self.next_video = 0 # Rows of earlier videos are written, later ones wait in finished_rows
+        self.finished_rows: Dict[str, Optional[Tuple[str, Dict[str, Any]]]] = {}
+        self.language_writer = self.language_processor.open_writer()
+        self.probe_results: List[Dict[str, Any]] = []
+        self.decode_results: List[Dict[str, Any]] = []
+        self.keypoint_results: List[Dict[str, Any]] = []
+        handlers = {'probe': self._on_probed, 'decode': self._on_decoded, 'keypoint': self._on_keypoints}
+
+        start = time.perf_counter()
+        self._start_workers()
+        self.progress = tqdm(total=len(video_paths))
+        try:
+            for video_path in video_paths: # Sorted by video id
+                if self.metadata_index.is_stale(video_path):
+                    self.ready['probe'].append(video_path)
+                else:
+                    self._on_probed((video_path, self.metadata_index.get(video_path), None)) # Probed by a previous run
+
+            while any(self.ready[stage] or self.in_flight[stage] for stage in STAGES):
+                self._dispatch()
+                stage, result, error = self._get_result()
+                self.in_flight[stage] -= 1
+                if error is not None:
+                    raise RuntimeError(f'{stage} stage failed:\n{error}')
+                handlers[stage](result)
+        except BaseException:
+            self._stop_workers(terminate=True)
+            raise
+        finally:
+            self.progress.close()
+            self.manifest.save()
+            self.metadata_index.save()
+        self._stop_workers()
+        wall_time = time.perf_counter() - start # Stages overlap, so each stage is reported against the wall time of the whole pipeline
+
+        self.video_processor.report_skipped_videos(self.decode_results)
+        model_timings = [result for result in self.decode_results if not result['skipped']] if self.args.fused else self.keypoint_results
+        self.keypoint_extractor.report_model_timings(model_timings)
+        self.video_processor.save_stage_report('probe', self.probe_results, wall_time, scheduler='pipelined')
+        self.video_processor.save_stage_report(self.decode_processor.MANIFEST_STAGE, self.decode_results, wall_time, scheduler='pipelined',
+                                                skipped=sum(result['skipped'] for result in self.decode_results))
+        if not self.args.fused:
+            self.keypoint_extractor.save_stage_report(self.keypoint_extractor.MANIFEST_STAGE, self.keypoint_results, wall_time, scheduler='pipelined')
+        if self.args.keypoint_store:
+            self.keypoint_extractor.pack_keypoint_store()
+        self.language_processor.close_writer(self.language_writer, wall_time)
+        logging.info('Pipelined Process Completed')
@@ -1,68 +1,102 @@
 import os
-import glob
-from typing import Any, Dict, List, Optional, Tuple
-
-import cv2
-import numpy as np
-from moviepy.editor import VideoFileClip
+import time
+import argparse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from .args import get_args
+from .file_index import FILE_TYPES, FileIndex
+from .frame_store import FRAME_STORES, FrameStore
+from .label_cache import LabelCache
+from .manifest import BuildManifest
+from .telemetry import RunReport, is_sampled, run_profiled
+from .video_metadata import VideoMetadataIndex
 
 class Processor:
-    def __init__(self) -> None:
-        args = get_args()
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        args = get_args() if args is None else args # Parsed arguments can be passed in, e.g. by the benchmarks
         self.args = args
+        self.file_index: Optional[FileIndex] = None # Built on first use, SignProcessor shares one index between the processors
+        self.frame_store: FrameStore = FRAME_STORES[args.frame_format](args.extension, args.frame_crf) # How the Video folder keeps the cropped frames
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['file_index'] = None # Pool tasks pickle the bound method with its processor, workers get resolved paths instead of the whole index
+        return state
         
-    def _filter_videos_by_fps(self, video_path: str) -> Optional[str]:
-        clip = VideoFileClip(video_path)
-        return video_path if self.args.min_fps <= clip.fps <= self.args.max_fps else None
-    
-    def _sort_by_filename(self, paths: List[str]) -> List[str]:
-        return sorted(paths, key=self._get_filename_without_extension)
+    def open_video_metadata(self) -> VideoMetadataIndex:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        return VideoMetadataIndex(os.path.join(self.args.save_path, mode_folder, 'video_metadata.json'))
+
+    def _load_video_metadata(self, video_paths: List[str]) -> VideoMetadataIndex:
+        metadata_index = self.open_video_metadata()
+        start = time.perf_counter()
+        telemetry = metadata_index.update(video_paths, self.args.mp) # Only new or modified videos are probed
+        self.save_stage_report('probe', telemetry, time.perf_counter() - start)
+        return metadata_index
+
+    def probe_video(self, video_path: str) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        return (video_path, *VideoMetadataIndex.timed_probe(video_path))
+
+    def is_fps_in_range(self, video_metadata: Dict[str, Any]) -> bool:
+        return self.args.min_fps <= video_metadata['fps'] <= self.args.max_fps
+
+    def load_manifest(self) -> BuildManifest:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        return BuildManifest(os.path.join(self.args.save_path, mode_folder, 'manifest.json'))
+
+    def load_label_cache(self) -> LabelCache:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        return LabelCache(os.path.join(self.args.save_path, mode_folder, 'labels.json'))
+
+    def _get_report_path(self) -> str:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        return os.path.join(self.args.save_path, mode_folder, 'reports')
+
+    def save_stage_report(self, stage: str, telemetry: List[Dict[str, Any]], wall_time: float, **extra: Any) -> None:
+        run_report = RunReport(self._get_report_path())
+        run_report.add(stage, telemetry, wall_time, **extra)
+        run_report.save()
+
+    def _run_profiled(self, stage: str, video_name: str, function: Callable[..., Any], *args: Any) -> Any:
+        if self.args.profile_sample_rate > 0 and is_sampled(video_name, self.args.profile_sample_rate):
+            profile_path = os.path.join(self._get_report_path(), 'profiles', stage, f'{video_name}.prof')
+            return run_profiled(profile_path, function, *args)
+        return function(*args)
+
+    def get_manifest_params(self, names: List[str]) -> Dict[str, Any]:
+        return {name: getattr(self.args, name) for name in names}
+
+    @staticmethod
+    def _longest_first(items: Iterable[Any], key: Callable[[Any], int]) -> List[Any]:
+        return sorted(items, key=key, reverse=True) # So the longest videos do not all land at the end of the run, ties keep their order
+
+    def _filter_videos_by_fps(self, video_paths: List[str], metadata_index: VideoMetadataIndex) -> List[str]:
+        return [path for path in video_paths if self.is_fps_in_range(metadata_index.get(path))]
     
-    def _get_filename_without_extension(self, path: str) -> str:
+    def get_filename_without_extension(self, path: str) -> str:
         return os.path.splitext(os.path.basename(path))[0]
 
-    def _get_filenames_without_extension(self, paths: List[str]) -> set:
-        return {self._get_filename_without_extension(p) for p in paths}
-        
-    def _find_file_paths(self, file_type: str) -> List[str]:
-        assert file_type in ['json', 'mp4'], 'file_type must be either "json" or "mp4"'
+    def _get_source_directory(self, file_type: str) -> str:
+        assert file_type in FILE_TYPES, 'file_type must be either "json" or "mp4"'
         
         mode_folder, _, mode_json = self._get_data_mode_path(self.args.processing_type)
-        file_directory = os.path.join(self.args.root_path, '01.데이터', mode_folder,
-                                      '라벨링데이터' if file_type == 'json' else '원천데이터',
-                                      mode_json if file_type == 'json' else '1.mp4',
-                                      '2.untact_morpheme' if file_type == 'json' else '3.crowd')
-        return glob.glob(f'{file_directory}/**/*.{file_type}', recursive=True)    
-    
-    def _find_json_file_paths(self) -> Dict[str, str]:
-        mode_folder, _, mode_json = self._get_data_mode_path(self.args.processing_type)
-        json_directory = os.path.join(self.args.root_path, '01.데이터', mode_folder, '라벨링데이터', mode_json, '2.untact_morpheme')
-        json_file_paths = glob.glob(f'{json_directory}/**/*.json', recursive=True)
-        return {os.path.basename(path).split('.')[0]: path for path in json_file_paths}
-    
-    def _read_video_frames(self, video_name: str) -> List[str]:
-        frame_paths = glob.glob(f'{os.path.join(self.video_root, video_name)}/*.{self.args.extension}', recursive=True)
-        frame_paths.sort()
-        return frame_paths
-    
-    def _find_matching_files(self) -> Tuple[List[str], List[str]]:
-        json_paths, video_paths = map(sorted, (self._find_file_paths(ft) for ft in ('json', 'mp4')))
-        
-        json_names, video_names = (self._get_filenames_without_extension(paths) for paths in (json_paths, video_paths))
-        matching_files = json_names & video_names # intersection of json and video
-                
-        return [p for p in json_paths if self._get_filename_without_extension(p) in matching_files], \
-               [p for p in video_paths if self._get_filename_without_extension(p) in matching_files]
-    
-    def _process_frame(self, frame_path: str) -> Optional[np.ndarray]:
-        try:
-            image: np.ndarray = cv2.imread(frame_path, cv2.IMREAD_COLOR)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            return image
-        except Exception as e:
-            return None
+        return os.path.join(self.args.root_path, '01.데이터', mode_folder,
+                            '라벨링데이터' if file_type == 'json' else '원천데이터',
+                            mode_json if file_type == 'json' else '1.mp4',
+                            '2.untact_morpheme' if file_type == 'json' else '3.crowd')
+
+    def _get_file_index(self) -> FileIndex:
+        if self.file_index is None:
+            _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+            index_path = os.path.join(self.args.save_path, mode_folder, 'file_index.json') if self.args.file_index_cache else None
+            self.file_index = FileIndex({file_type: self._get_source_directory(file_type) for file_type in FILE_TYPES}, index_path)
+        return self.file_index
+
+    def find_matching_files(self) -> Tuple[List[str], List[str]]:
+        file_index = self._get_file_index()
+        matching_ids = file_index.get_matching_ids() # Sorted by video id
+        return [file_index.get_paths('json')[video_id] for video_id in matching_ids], \
+               [file_index.get_paths('mp4')[video_id] for video_id in matching_ids]
     
     def _get_data_mode_path(self, data_mode: str) -> Optional[Tuple[str, str]]:
         data_mode_paths = {'train': ('1.Training', 'Train', '03_JSON_TrL'), 
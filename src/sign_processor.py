@@ -1,14 +1,27 @@
 import os
+import argparse
+from typing import Optional
 
+from .args import get_args
+from .fused_processor import FusedProcessor
 from .keypoint_extractor import KeypointExtractor
+from .label_processor import LabelProcessor
 from .language_processor import LanguageProcessor
+from .pipeline_scheduler import PipelineScheduler
+from .token_exporter import TokenExporter
 from .video_processor import VideoProcessor
 
 class SignProcessor:
-    def __init__(self) -> None:
-        self.video_processor = VideoProcessor()
-        self.keypoint_extractor = KeypointExtractor()
-        self.language_processor = LanguageProcessor()
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        args = get_args() if args is None else args
+        self.label_processor = LabelProcessor(args)
+        self.video_processor = VideoProcessor(args)
+        self.keypoint_extractor = KeypointExtractor(args)
+        self.language_processor = LanguageProcessor(args)
+        self.fused_processor = FusedProcessor(args)
+        self.token_exporter = TokenExporter(args)
+        self.pipeline_scheduler = PipelineScheduler(self.label_processor, self.video_processor, self.keypoint_extractor,
+                                                    self.language_processor, self.fused_processor)
 
     def _make_dir_if_not_exists(self, dir_path: str) -> None:
         os.makedirs(dir_path, exist_ok=True)
@@ -31,8 +44,23 @@ class SignProcessor:
         self._create_subfolders(train_dir, subfolders)
         self._create_subfolders(validation_dir, subfolders)
 
+    def _share_file_index(self) -> None:
+        file_index = self.label_processor._get_file_index() # A single discovery pass over the source folders for every stage
+        for processor in (self.video_processor, self.keypoint_extractor, self.language_processor, self.fused_processor):
+            processor.file_index = file_index
+
     def start(self) -> None:
         self._prepare_directory_structure(self.video_processor.args.save_path) # make folder for result
-        self.video_processor.process()
-        self.keypoint_extractor.process()
-        self.language_processor.process()
+        self._share_file_index()
+        if self.video_processor.args.scheduler == 'pipelined':
+            self.pipeline_scheduler.run() # Each video flows through all stages as soon as it is ready
+        else:
+            self.label_processor.process() # Parse every label JSON once for the video and language stages
+            if self.video_processor.args.fused:
+                self.fused_processor.process() # Decode, crop and extract keypoints in one pass over each video
+            else:
+                self.video_processor.process()
+                self.keypoint_extractor.process()
+            self.language_processor.process()
+        if self.video_processor.args.export_tokens:
+            self.token_exporter.process() # Integer encoded glosses and texts for the training loaders
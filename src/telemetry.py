@@ -0,0 +1,106 @@
+import os
+import csv
+import json
+import time
+import zlib
+import cProfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+try:
+    import resource
+except ImportError: # Not available on Windows, peak memory is then reported as 0
+    resource = None
+
+def get_peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # ru_maxrss is in kilobytes on Linux
+
+def get_worker_stats() -> Dict[str, Any]:
+    return {'worker': os.getpid(), 'peak_rss_mb': round(get_peak_rss_mb(), 1)}
+
+@contextmanager
+def timed(timings: Dict[str, float], key: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+
+def timed_iter(items: Iterable[Any], timings: Dict[str, float], key: str) -> Iterator[Any]:
+    iterator = iter(items)
+    timings.setdefault(key, 0.0)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[key] += time.perf_counter() - start
+            return
+        timings[key] += time.perf_counter() - start # Only the time spent producing the item, not consuming it
+        yield item
+
+def is_sampled(name: str, sample_rate: float) -> bool:
+    return zlib.crc32(name.encode('utf-8')) % 10000 < sample_rate * 10000 # The same videos are sampled on every run
+
+def run_profiled(profile_path: str, function: Callable[..., Any], *args: Any) -> Any:
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        profile.dump_stats(profile_path)
+
+class RunReport:
+    """
+    Per-video telemetry rows of each stage, saved as `<stage>.csv`, and a per-stage summary
+    (wall time, summed sub-step times, frames per second, bytes written, peak memory per worker) in `run_report.json`.
+    Stages are merged into the existing report, so the stages of one run can be saved one after another.
+    """
+    def __init__(self, report_path: str) -> None:
+        self.report_path = report_path
+        self.summary_path = os.path.join(report_path, 'run_report.json')
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.summary_path):
+            with open(self.summary_path, 'r', encoding='utf-8') as summary_file:
+                self.stages = json.load(summary_file)['stages']
+
+    def _summarize(self, telemetry: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        frames = sum(row.get('frames', 0) for row in telemetry)
+        time_keys = sorted({key for row in telemetry for key in row if key.endswith('_time')})
+        peak_rss = {}
+        for row in telemetry:
+            if 'worker' in row:
+                peak_rss[str(row['worker'])] = max(peak_rss.get(str(row['worker']), 0.0), row['peak_rss_mb'])
+        return {
+            'videos': len(telemetry),
+            'frames': frames,
+            'wall_time': round(wall_time, 3),
+            'videos_per_sec': round(len(telemetry) / wall_time, 3) if wall_time > 0 else 0.0,
+            'frames_per_sec': round(frames / wall_time, 3) if wall_time > 0 else 0.0,
+            'bytes_written': sum(row.get('bytes_written', 0) for row in telemetry),
+            'times': {key: round(sum(row.get(key, 0.0) for row in telemetry), 3) for key in time_keys}, # Summed over workers, can exceed the wall time
+            'peak_rss_mb': {'main': round(get_peak_rss_mb(), 1), 'workers': peak_rss},
+            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def add(self, stage: str, telemetry: List[Dict[str, Any]], wall_time: float, **extra: Any) -> None:
+        self.stages[stage] = {**self._summarize(telemetry, wall_time), **extra}
+        stage_path = os.path.join(self.report_path, f'{stage}.csv')
+        if not telemetry:
+            if os.path.exists(stage_path):
+                os.remove(stage_path) # Rows of a previous run would not match the summary
+            return
+        fieldnames = list(dict.fromkeys(key for row in telemetry for key in row if key != 'outputs'))
+        os.makedirs(self.report_path, exist_ok=True)
+        with open(stage_path, 'w', encoding='utf-8', newline='') as stage_file:
+            writer = csv.DictWriter(stage_file, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(telemetry)
+
+    def save(self) -> None:
+        os.makedirs(self.report_path, exist_ok=True)
+        with open(f'{self.summary_path}.tmp', 'w', encoding='utf-8') as summary_file:
+            json.dump({'stages': self.stages}, summary_file, indent=4, ensure_ascii=False)
+        os.replace(f'{self.summary_path}.tmp', self.summary_path)
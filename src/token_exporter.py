@@ -0,0 +1,99 @@
+import os
+import json
+import logging
+import argparse
+import collections
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .keypoint_store import INDEX_FILENAME
+from .language_writer import read_language_rows
+from .processor import Processor
+
+SPECIAL_TOKENS = ['<pad>', '<unk>'] # Ids 0 and 1 of every exported vocabulary
+SPACE_TOKEN = '▁' # Stands for a space in character tokenized text
+
+class TokenExporter(Processor):
+    """
+    Exports the gloss sequences and Korean texts of the Language output as int32 token ids, so data loaders
+    do no string work per sample. Each sequence is stored in one flat `<name>_ids.npy` array, and sequence `i`
+    is `ids[offsets[i]:offsets[i + 1]]`. Rows follow the Language output (video id order), and
+    `keypoint_index.npy` gives the position of each row in the keypoint store (-1 without one).
+    """
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
+
+    def _tokenize_text(self, text: str) -> List[str]:
+        if self.args.text_tokenizer == 'char':
+            return [SPACE_TOKEN if character == ' ' else character for character in text.strip()]
+        return text.split()
+
+    def _load_vocabulary(self, vocab_path: str) -> List[str]:
+        with open(vocab_path, 'r', encoding='utf-8') as vocab_file:
+            tokens = [line.rstrip('\n') for line in vocab_file if line.rstrip('\n')]
+        return SPECIAL_TOKENS + [token for token in tokens if token not in SPECIAL_TOKENS]
+
+    def _build_vocabulary(self, sequences: Iterable[List[str]]) -> List[str]:
+        token_counts = collections.Counter(token for sequence in sequences for token in sequence)
+        return SPECIAL_TOKENS + [token for token, _ in token_counts.most_common()] # Most frequent first, like the gloss vocab
+
+    def _encode(self, sequences: List[List[str]], vocabulary: List[str]) -> Tuple[np.ndarray, np.ndarray, int]:
+        token_ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+        unknown_id = token_ids['<unk>']
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(sequence) for sequence in sequences], out=offsets[1:])
+        ids = np.fromiter((token_ids.get(token, unknown_id) for sequence in sequences for token in sequence),
+                          dtype=np.int32, count=int(offsets[-1]))
+        return ids, offsets, int(np.count_nonzero(ids == unknown_id))
+
+    def _get_keypoint_index(self, video_ids: List[str]) -> np.ndarray:
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        store_index_path = os.path.join(self.args.save_path, mode_folder, 'KeypointStore', INDEX_FILENAME)
+        if not os.path.exists(store_index_path):
+            return np.full(len(video_ids), -1, dtype=np.int32)
+        with open(store_index_path, 'r', encoding='utf-8') as index_file:
+            store_positions = {video_id: position for position, video_id in enumerate(json.load(index_file)['videos'])}
+        return np.array([store_positions.get(video_id, -1) for video_id in video_ids], dtype=np.int32)
+
+    def _save_vocabulary(self, vocabulary: List[str], vocab_path: str) -> None:
+        with open(vocab_path, 'w', encoding='utf-8') as vocab_file:
+            for token in vocabulary:
+                vocab_file.write(token + '\n')
+
+    def process(self) -> None:
+        logging.info('Token export in progress...')
+        _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
+        language_path = os.path.join(self.args.save_path, mode_folder, 'Language')
+        token_path = os.path.join(self.args.save_path, mode_folder, 'Tokens')
+        os.makedirs(token_path, exist_ok=True)
+
+        rows = list(read_language_rows(language_path, mode_folder, self.args.language_format))
+        video_ids = [video_id for video_id, _ in rows]
+        sequences = {
+            'gloss': [row['gloss_sequence'].split() for _, row in rows],
+            'text': [self._tokenize_text(row['korean_text']) for _, row in rows],
+        }
+        vocab_paths = { # Validation should reuse the vocabularies of Train, so both splits share the token ids
+            'gloss': self.args.gloss_vocab_path or os.path.join(language_path, f'{mode_folder}.vocab'),
+            'text': self.args.text_vocab_path,
+        }
+
+        metadata = {'num_sequences': len(rows), 'special_tokens': SPECIAL_TOKENS, 'text_tokenizer': self.args.text_tokenizer}
+        for name, name_sequences in sequences.items():
+            vocab_path = vocab_paths[name]
+            vocabulary = self._load_vocabulary(vocab_path) if vocab_path else self._build_vocabulary(name_sequences)
+            ids, offsets, num_unknown = self._encode(name_sequences, vocabulary)
+            np.save(os.path.join(token_path, f'{name}_ids.npy'), ids)
+            np.save(os.path.join(token_path, f'{name}_offsets.npy'), offsets)
+            self._save_vocabulary(vocabulary, os.path.join(token_path, f'{name}.vocab'))
+            metadata[name] = {'vocab_size': len(vocabulary), 'num_tokens': len(ids), 'num_unknown': num_unknown,
+                              'max_length': int(np.diff(offsets).max(initial=0))}
+            logging.info(f'{name}: {len(ids)} tokens, vocabulary of {len(vocabulary)}, {num_unknown} unknown')
+
+        np.save(os.path.join(token_path, 'keypoint_index.npy'), self._get_keypoint_index(video_ids))
+        with open(os.path.join(token_path, 'video_ids.json'), 'w', encoding='utf-8') as video_ids_file:
+            json.dump(video_ids, video_ids_file, ensure_ascii=False)
+        with open(os.path.join(token_path, 'tokens.json'), 'w', encoding='utf-8') as metadata_file:
+            json.dump(metadata, metadata_file, indent=4, ensure_ascii=False)
+        logging.info('Token Export Completed')
@@ -0,0 +1,130 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.video.fx.all import crop
+from PIL import Image
+
+from .telemetry import timed
+
+try:
+    import av
+except ImportError: # PyAV is optional, only needed for --decode_backend pyav
+    av = None
+
+Image.ANTIALIAS = Image.LANCZOS
+
+class VideoDecoder(ABC):
+    """
+    Decodes the [start, end) window of a video as signer centered, square RGB frames of `size` pixels.
+    Every backend returns the frames moviepy would return: one frame per 1 / fps seconds, and the last
+    frame repeated when the window goes past the end of the video. Backends that crop outside of the decoder
+    add the time spent cropping and resizing to `timings['crop_resize_time']`.
+    """
+    def _get_crop_box(self, width: int, height: int, y_top: int) -> Tuple[int, int, int, int]:
+        x1, x2 = (width / 2) - ((height - y_top) / 2), (width / 2) + ((height - y_top) / 2)
+        return int(x1), int(y_top), int(x2), int(height) # Truncated like moviepy crop
+
+    def _get_clip_duration(self, video_metadata: Dict[str, Any]) -> float:
+        return math.floor(video_metadata['duration'] * 100 + 0.5) / 100 # moviepy reads the duration ffmpeg prints, rounded to 1/100 s
+
+    def _get_frame_indices(self, start: int, end: int, video_metadata: Dict[str, Any]) -> np.ndarray:
+        fps = video_metadata['fps']
+        clip_end = self._get_clip_duration(video_metadata) if end == -1 else end
+        return (fps * (start + np.arange(0, clip_end - start, 1.0 / fps)) + 0.00001).astype(int) # Same frame times as moviepy iter_frames
+
+    def count_frames(self, start: int, end: int, video_metadata: Dict[str, Any]) -> int:
+        return len(self._get_frame_indices(start, end, video_metadata))
+
+    def _crop_resize(self, frame: np.ndarray, crop_box: Tuple[int, int, int, int], size: int) -> np.ndarray:
+        x1, y1, x2, y2 = crop_box
+        cropped = frame[y1:y2, x1:x2] # Slicing is a view, no pixel is copied
+        interpolation = cv2.INTER_LINEAR if size > cropped.shape[0] else cv2.INTER_AREA
+        return cv2.resize(cropped, (size, size), interpolation=interpolation)
+
+    @abstractmethod
+    def iter_frames(self, video_path: str, start: int, end: int, y_top: int, size: int,
+                    video_metadata: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Iterator[np.ndarray]:
+        pass
+
+class MoviepyDecoder(VideoDecoder):
+    def iter_frames(self, video_path: str, start: int, end: int, y_top: int, size: int,
+                    video_metadata: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Iterator[np.ndarray]:
+        clip = VideoFileClip(video_path)
+        try:
+            subclip = clip.subclip(start, None if end == -1 else end) # Drop inactive frames
+            cropped_clip = crop(subclip, x1=(subclip.w / 2) - ((subclip.h - y_top) / 2), y1=y_top,
+                                x2=(subclip.w / 2) + ((subclip.h - y_top) / 2), y2=subclip.h).resize((size, size)) # Signer centered crop
+            yield from cropped_clip.iter_frames() # Cropping and resizing run inside moviepy, so they count as decode time
+        finally:
+            clip.close()
+
+class OpenCVDecoder(VideoDecoder):
+    def iter_frames(self, video_path: str, start: int, end: int, y_top: int, size: int,
+                    video_metadata: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Iterator[np.ndarray]:
+        frame_indices = self._get_frame_indices(start, end, video_metadata)
+        if len(frame_indices) == 0:
+            return
+        timings = {} if timings is None else timings
+        crop_box = self._get_crop_box(video_metadata['width'], video_metadata['height'], y_top)
+        capture = cv2.VideoCapture(video_path)
+        try:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(frame_indices[0])) # Seek to the start instead of decoding from the beginning
+            position, frame = int(frame_indices[0]) - 1, None
+            for frame_index in frame_indices:
+                grabbed = False
+                while position < frame_index and capture.grab(): # Past the end of the video, the last frame is kept
+                    position += 1
+                    grabbed = True
+                if grabbed:
+                    _, raw_frame = capture.retrieve()
+                    with timed(timings, 'crop_resize_time'):
+                        frame = cv2.cvtColor(self._crop_resize(raw_frame, crop_box, size), cv2.COLOR_BGR2RGB)
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            capture.release()
+
+class PyAVDecoder(VideoDecoder):
+    def __init__(self) -> None:
+        if av is None:
+            raise ImportError('--decode_backend pyav requires PyAV (pip install av).')
+
+    def iter_frames(self, video_path: str, start: int, end: int, y_top: int, size: int,
+                    video_metadata: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Iterator[np.ndarray]:
+        frame_indices = self._get_frame_indices(start, end, video_metadata)
+        if len(frame_indices) == 0:
+            return
+        fps = video_metadata['fps']
+        timings = {} if timings is None else timings
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            stream_start = stream.start_time or 0
+            crop_box = self._get_crop_box(stream.codec_context.width, stream.codec_context.height, y_top)
+            container.seek(stream_start + int(frame_indices[0] / fps / stream.time_base), stream=stream, backward=True) # Nearest keyframe before the start
+
+            targets = iter(frame_indices)
+            target = next(targets, None)
+            frame = None
+            for decoded in container.decode(stream):
+                position = int(round(float((decoded.pts - stream_start) * stream.time_base) * fps))
+                if position < target:
+                    continue
+                raw_frame = decoded.to_ndarray(format='rgb24')
+                with timed(timings, 'crop_resize_time'):
+                    frame = self._crop_resize(raw_frame, crop_box, size)
+                while target is not None and target <= position:
+                    yield frame
+                    target = next(targets, None)
+                if target is None:
+                    return
+            while frame is not None and target is not None: # Past the end of the video, keep the last frame
+                yield frame
+                target = next(targets, None)
+
+DECODERS = {'moviepy': MoviepyDecoder, 'opencv': OpenCVDecoder, 'pyav': PyAVDecoder}
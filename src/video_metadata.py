@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import logging
+import multiprocessing as mp
+from typing import Any, Dict, List, Tuple
+
+import cv2
+from tqdm import tqdm
+
+from .telemetry import get_worker_stats
+
+class VideoMetadataIndex:
+    """
+    On-disk index of video metadata (fps, frame count, duration, resolution) keyed by path.
+    An entry is reused as long as the size and modification time of the video are unchanged.
+    """
+    def __init__(self, index_path: str) -> None:
+        self.index_path = index_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as index_file:
+                self.entries = json.load(index_file)
+
+    @staticmethod
+    def _fingerprint(video_path: str) -> List[float]:
+        stat = os.stat(video_path)
+        return [stat.st_size, stat.st_mtime]
+
+    @staticmethod
+    def probe(video_path: str) -> Dict[str, Any]:
+        capture = cv2.VideoCapture(video_path) # Reads the container header only, no frame is decoded
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) if capture.isOpened() else 0.0
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) if capture.isOpened() else 0
+            return {
+                'fingerprint': VideoMetadataIndex._fingerprint(video_path),
+                'fps': fps,
+                'frame_count': frame_count,
+                'duration': frame_count / fps if fps > 0 else 0.0,
+                'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            }
+        finally:
+            capture.release()
+
+    @staticmethod
+    def timed_probe(video_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        start = time.perf_counter()
+        video_metadata = VideoMetadataIndex.probe(video_path)
+        telemetry = {'video': os.path.splitext(os.path.basename(video_path))[0], 'probe_time': time.perf_counter() - start, **get_worker_stats()}
+        return video_metadata, telemetry
+
+    def is_stale(self, video_path: str) -> bool:
+        entry = self.entries.get(video_path)
+        return entry is None or entry['fingerprint'] != self._fingerprint(video_path)
+
+    def update(self, video_paths: List[str], processes: int) -> List[Dict[str, Any]]:
+        stale_paths = [path for path in video_paths if self.is_stale(path)]
+        logging.info(f'Probing {len(stale_paths)} videos ({len(video_paths) - len(stale_paths)} reused from {self.index_path})...')
+        if not stale_paths:
+            return []
+        with mp.Pool(processes=processes) as pool:
+            probed = list(tqdm(pool.imap(VideoMetadataIndex.timed_probe, stale_paths, chunksize=16), total=len(stale_paths)))
+        self.entries.update((path, video_metadata) for path, (video_metadata, _) in zip(stale_paths, probed))
+        self.save()
+        return [telemetry for _, telemetry in probed]
+
+    def save(self) -> None:
+        with open(f'{self.index_path}.tmp', 'w', encoding='utf-8') as index_file:
+            json.dump(self.entries, index_file, ensure_ascii=False)
+        os.replace(f'{self.index_path}.tmp', self.index_path)
+
+    def get(self, video_path: str) -> Dict[str, Any]:
+        return self.entries[video_path]
+
+    def set(self, video_path: str, video_metadata: Dict[str, Any]) -> None:
+        self.entries[video_path] = video_metadata
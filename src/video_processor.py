@@ -1,80 +1,176 @@
 import os
-import glob
-import json
 import logging
 import math
+import time
+import argparse
 import multiprocessing as mp
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 from tqdm import tqdm
-from moviepy.editor import VideoFileClip
-from moviepy.video.fx.all import crop
-from PIL import Image
 
+from .frame_store import FrameStore, FrameWriter
+from .manifest import BuildManifest
 from .processor import Processor
-
-Image.ANTIALIAS = Image.LANCZOS
+from .telemetry import get_worker_stats, timed, timed_iter
+from .video_decoder import DECODERS
 
 H, W = 1080, 1920
+FRAME_COUNT_TOLERANCE = 1 # Frames of slack when skipping videos by their predicted frame count
 
 class VideoProcessor(Processor):
-    def __init__(self) -> None:
-        super().__init__()
+    MANIFEST_STAGE = 'video'
+    MANIFEST_PARAMS = ['time_margin', 'point_margin', 'resize', 'extension', 'max_frame', 'decode_backend', 'frame_format', 'frame_crf'] # Arguments that change the saved frames
+
+    def __init__(self, args: Optional[argparse.Namespace] = None) -> None:
+        super().__init__(args)
+        self.decoder = DECODERS[self.args.decode_backend]()
         
-    def _get_start_end(self, data: Dict[str, Any], time_margin: int = 1) -> Tuple[int, int]:
-        try:
-            total = sum(data.values(), [])
-            start, end = min(i['start'] for i in total), max(i['end'] for i in total)
-            return max(math.floor(start) - time_margin, 0), math.ceil(end) + time_margin
-        except KeyError:
-            logging.error("JSON error")
+    def _get_start_end(self, sign_window: Optional[List[float]], time_margin: int = 1) -> Tuple[int, int]:
+        if sign_window is None: # Broken sign_script, keep the whole video
             return 0, -1
+        start, end = sign_window
+        return max(math.floor(start) - time_margin, 0), math.ceil(end) + time_margin
 
-    def _get_y_top(self, pose_keypoints: List[float], point_margin: float) -> int:
-        top_position = min(keypoint[j] for keypoint in pose_keypoints for j in range(1, 75, 3))
-        return max(int(top_position - ((H - top_position) * point_margin)), 0)
+    def _get_y_top(self, pose_top: float, point_margin: float) -> int:
+        return max(int(pose_top - ((H - pose_top) * point_margin)), 0)
 
-    def _get_json_data(self, json_path: str) -> Tuple[int, int, int]:
-        with open(json_path, 'r') as json_file:
-            json_data = json.load(json_file)
-        start, end = self._get_start_end(json_data['sign_script'], self.args.time_margin)
-        y_top = self._get_y_top(json_data['landmarks']['pose_keypoints_2d'], self.args.point_margin)
+    def _get_label_data(self, label: Dict[str, Any]) -> Tuple[int, int, int]:
+        start, end = self._get_start_end(label['sign_window'], self.args.time_margin)
+        y_top = self._get_y_top(label['pose_top'], self.args.point_margin)
         return start, end, y_top
 
-    def _video_to_images(self, start: int, end: int, y_top: int, video_path: str, folder_path: str) -> None:
-        clip = VideoFileClip(video_path).subclip(start, None if end == -1 else end) # Drop inactive frames
-        cropped_clip = crop(clip, x1=(clip.w / 2) - ((clip.h - y_top) / 2), y1=y_top,
-                            x2=(clip.w / 2) + ((clip.h - y_top) / 2), y2=clip.h).resize((self.args.resize, self.args.resize)) # Signer centered crop
-        for i, frame in enumerate(cropped_clip.iter_frames()):
-            Image.fromarray(frame).save(os.path.join(folder_path, f"frame_{int(i):04}.{self.args.extension}"))
+    def _iter_cropped_frames(self, start: int, end: int, y_top: int, video_path: str, video_metadata: Dict[str, Any], 
+                             timings: Dict[str, float]) -> Iterator[np.ndarray]:
+        frames = self.decoder.iter_frames(video_path, start, end, y_top, self.args.resize, video_metadata, timings) # Drop inactive frames & signer centered crop
+        yield from timed_iter(frames, timings, 'decode_time')
+        timings['decode_time'] -= timings.get('crop_resize_time', 0.0) # Cropping and resizing are reported separately
+
+    def _save_frame(self, writer: FrameWriter, frame: np.ndarray, timings: Dict[str, float]) -> None:
+        with timed(timings, 'write_time'):
+            writer.write(frame)
+
+    def _write_frames(self, frames: Iterable[np.ndarray], frame_path: str, fps: float, timings: Dict[str, float]) -> Iterator[np.ndarray]:
+        if self.args.frame_writer == 'none':
+            yield from frames
+            return
+
+        writer = self.frame_store.open_writer(frame_path, fps) # A folder of images, an npy array or an mp4 clip
+        executor = ThreadPoolExecutor(max_workers=1) if self.args.frame_writer == 'async' else None # Encode frames in the background
+        futures = []
+        closed = False
+        try:
+            for frame in frames:
+                if executor is None:
+                    self._save_frame(writer, frame, timings)
+                else:
+                    futures.append(executor.submit(self._save_frame, writer, frame, timings)) # Only the single writer thread updates the write timings
+                yield frame
+            if executor is not None:
+                executor.shutdown(wait=True)
+            for future in futures:
+                future.result() # Re-raise errors from the background writer
+            with timed(timings, 'write_time'):
+                timings['bytes_written'] = timings.get('bytes_written', 0) + writer.close()
+            closed = True
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            if not closed:
+                writer.abort() # No half written npy or mp4 is left behind
+
+    def _video_to_images(self, start: int, end: int, y_top: int, video_path: str, frame_path: str, 
+                         video_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        num_frames = 0
+        timings: Dict[str, float] = {}
+        frames = self._iter_cropped_frames(start, end, y_top, video_path, video_metadata, timings)
+        for num_frames, _ in enumerate(self._write_frames(frames, frame_path, video_metadata['fps'], timings), start=1):
+            pass
+        return {'video': self.get_filename_without_extension(video_path), 'frames': num_frames, **timings,
+                'outputs': {'files': {frame_path: BuildManifest.fingerprint(frame_path)}, 'frames': num_frames}}
 
-    def _save_images_from_video(self, file_paths: Tuple[str, str]) -> None:
+    def _predict_num_frames(self, start: int, end: int, video_metadata: Dict[str, Any]) -> int:
+        return self.decoder.count_frames(start, end, video_metadata)
+
+    def _predict_task_frames(self, video_task: Tuple[Dict[str, Any], str, Dict[str, Any]]) -> int:
+        label, _, video_metadata = video_task
+        start, end, _ = self._get_label_data(label)
+        return self._predict_num_frames(start, end, video_metadata)
+
+    def init_worker(self) -> None:
+        pass
+
+    def process_video(self, video_task: Tuple[Dict[str, Any], str, Dict[str, Any]]) -> Dict[str, Any]:
+        video_name = self.get_filename_without_extension(video_task[1])
+        result = self._run_profiled(self.MANIFEST_STAGE, video_name, self._process_video, video_task)
+        return {**result, **get_worker_stats()}
+
+    def _process_video(self, video_task: Tuple[Dict[str, Any], str, Dict[str, Any]]) -> Dict[str, Any]:
+        label, video_path, video_metadata = video_task
         _, mode_folder, _ = self._get_data_mode_path(self.args.processing_type)
-        folder_path = os.path.join(self.args.save_path, mode_folder, 'Video', self._get_filename_without_extension(file_paths[1]))
-        os.makedirs(folder_path, exist_ok=True)
+        video_name = self.get_filename_without_extension(video_path)
+        video_root = os.path.join(self.args.save_path, mode_folder, 'Video')
+        frame_path = self.frame_store.get_path(video_root, video_name)
         
-        start, end, y_top = self._get_json_data(file_paths[0])
-        self._video_to_images(start, end, y_top, file_paths[1], folder_path)
+        start, end, y_top = self._get_label_data(label)
+        predicted_frames = self._predict_num_frames(start, end, video_metadata)
+        FrameStore.remove(video_root, video_name) # Drop frames of a previous run, which may have a different length or format
+        if predicted_frames > self.args.max_frame + FRAME_COUNT_TOLERANCE: # Skip videos that would be dropped by max_frame before decoding them
+            keypoint_path = os.path.join(self.args.save_path, mode_folder, 'Keypoint', f'{video_name}.npy')
+            if os.path.exists(keypoint_path): # Keypoints of a previous run would still be packed into the keypoint store
+                os.remove(keypoint_path)
+            return {'video': video_name, 'predicted_frames': predicted_frames, 'skipped': True,
+                    'outputs': {'skipped': True, 'predicted_frames': predicted_frames}}
 
-    def _process_files(self, json_paths: List[str], video_paths: List[str]) -> None:
+        if self.args.frame_writer != 'none':
+            os.makedirs(video_root, exist_ok=True)
+        result = self._video_to_images(start, end, y_top, video_path, frame_path, video_metadata)
+        return {**result, 'predicted_frames': predicted_frames, 'skipped': False}
+
+    def report_skipped_videos(self, results: List[Dict[str, Any]]) -> None:
+        skipped_results = [result for result in results if result['skipped']]
+        total_frames = sum(result['predicted_frames'] for result in results)
+        skipped_frames = sum(result['predicted_frames'] for result in skipped_results)
+        logging.info(f'Skipped {len(skipped_results)} of {len(results)} videos predicted to exceed {self.args.max_frame} frames before decoding '
+                     f'({skipped_frames} of {total_frames} frames, {100 * skipped_frames / max(total_frames, 1):.1f}% of the decode and keypoint work avoided)')
+
+    def _process_files(self, video_paths: List[str]) -> List[Dict[str, Any]]:
         logging.info(f"Selecting videos with FPS between {self.args.min_fps} and {self.args.max_fps}...")
-        with mp.Pool(processes=self.args.mp) as pool:
-            video_paths = list(tqdm(pool.imap(self._filter_videos_by_fps, video_paths), total=len(video_paths)))
+        metadata_index = self._load_video_metadata(video_paths)
+        video_paths = self._filter_videos_by_fps(video_paths, metadata_index) # Still sorted by video id
         
-        video_paths = self._sort_by_filename(list(filter(None, video_paths)))
-        video_names = self._get_filenames_without_extension(video_paths)
+        label_cache = self.load_label_cache() # Labels are keyed by the same id as the videos they match
+        task_names = [self.get_filename_without_extension(video_path) for video_path in video_paths]
+        video_tasks = [(label_cache.get(name), video_path, metadata_index.get(video_path))
+                       for name, video_path in zip(task_names, video_paths)] # [(label, video, metadata), ...]
         
-        json_paths = [json_path for json_path in json_paths if self._get_filename_without_extension(json_path) in video_names]
-        json_paths = self._sort_by_filename(json_paths)
-        
-        file_pairs = list(zip(json_paths, video_paths)) # [(json, video), ...]
+        manifest = self.load_manifest()
+        params = self.get_manifest_params(self.MANIFEST_PARAMS)
+        inputs = {name: {'json': label['fingerprint'], 'mp4': BuildManifest.fingerprint(video_path)}
+                  for name, (label, video_path, _) in zip(task_names, video_tasks)}
+        pending_tasks = [task for name, task in zip(task_names, video_tasks) # Redo only videos whose inputs, parameters or outputs changed
+                         if not manifest.is_up_to_date(self.MANIFEST_STAGE, name, inputs[name], params)]
+        pending_tasks = self._longest_first(pending_tasks, self._predict_task_frames)
+        logging.info(f"{len(video_tasks) - len(pending_tasks)} of {len(video_tasks)} videos are up to date in {manifest.manifest_path}")
         
         logging.info("Saving images for data...")
-        with mp.Pool(processes=self.args.mp) as pool:
-            list(tqdm(pool.imap(self._save_images_from_video, file_pairs), total=len(file_pairs)))
+        results = []
+        start = time.perf_counter()
+        try:
+            with mp.Pool(processes=self.args.mp, initializer=self.init_worker) as pool:
+                for result in tqdm(pool.imap(self.process_video, pending_tasks, chunksize=self.args.chunksize), total=len(pending_tasks)):
+                    manifest.record(self.MANIFEST_STAGE, result['video'], inputs[result['video']], params, result['outputs'])
+                    results.append(result)
+        finally:
+            manifest.save() # Videos finished before a failing one are not redone on the next run
+        self.report_skipped_videos(results)
+        self.save_stage_report(self.MANIFEST_STAGE, results, time.perf_counter() - start, 
+                                skipped=sum(result['skipped'] for result in results))
+        return results
     
     def process(self) -> None:
         logging.info('Video preprocessing in progress...')
-        json_paths, video_paths = self._find_matching_files()
-        self._process_files(json_paths, video_paths)
+        _, video_paths = self.find_matching_files()
+        self._process_files(video_paths)
         logging.info('Video Process Completed')